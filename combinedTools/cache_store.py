@@ -0,0 +1,136 @@
+"""
+Small persistent key/value cache backed by SQLite.
+
+Entries are JSON-encoded and grouped by namespace so several tools can share
+one database file. Each namespace has its own TTL and an optional size bound;
+when the bound is exceeded the least recently used entries are evicted.
+
+The database lives in the project root (or at PREPPILOT_CACHE_DB, relative
+paths resolved against the project root), so every entry point shares one
+cache whatever the working directory. It is opened on first use, not at
+import.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DB_PATH = os.path.join(
+    PROJECT_ROOT, os.getenv("PREPPILOT_CACHE_DB", ".preppilot_cache.sqlite3")
+)
+
+_db_lock = threading.Lock()
+# Database files whose cache table is known to exist
+_initialized = set()
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    stored_at: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+
+class SqliteCache:
+    """A namespaced, TTL- and size-bounded cache persisted in SQLite."""
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        path: str = CACHE_DB_PATH,
+    ):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.path = path
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Connection in a transaction; call with `_db_lock` held."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                if self.path not in _initialized:
+                    conn.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS cache (
+                            namespace TEXT NOT NULL,
+                            key TEXT NOT NULL,
+                            value TEXT NOT NULL,
+                            stored_at REAL NOT NULL,
+                            accessed_at REAL NOT NULL,
+                            PRIMARY KEY (namespace, key)
+                        )
+                        """
+                    )
+                    _initialized.add(self.path)
+                yield conn
+        finally:
+            conn.close()
+
+    def is_fresh(self, entry: CacheEntry, ttl_seconds: Optional[float] = None) -> bool:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        return ttl is None or entry.age < ttl
+
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        """Return the stored entry regardless of age, marking it as recently used."""
+        with _db_lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, stored_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (time.time(), self.namespace, key),
+            )
+        return CacheEntry(value=json.loads(row[0]), stored_at=row[1])
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the value for `key` if it is present and within the TTL."""
+        entry = self.get_entry(key)
+        if entry is None or not self.is_fresh(entry):
+            return None
+        return entry.value
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        encoded = json.dumps(value, ensure_ascii=False, default=str)
+        with _db_lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, encoded, now, now),
+            )
+            if self.max_entries is not None:
+                conn.execute(
+                    """
+                    DELETE FROM cache WHERE namespace = ? AND key NOT IN (
+                        SELECT key FROM cache WHERE namespace = ?
+                        ORDER BY accessed_at DESC LIMIT ?
+                    )
+                    """,
+                    (self.namespace, self.namespace, self.max_entries),
+                )
+
+    def delete(self, key: str) -> None:
+        with _db_lock, self._connect() as conn:
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            )
@@ -0,0 +1,76 @@
+"""
+Bounded fan-out helper shared by the tools.
+
+`run_concurrently` runs a blocking function over a list of inputs on a
+bounded thread pool and returns the results in input order. Each item gets
+its own timeout, measured from when its worker actually starts, so items
+queued behind a full pool are not penalised for waiting.
+"""
+
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_POLL_INTERVAL_SECONDS = 0.1
+
+
+def _result_within(
+    future: Future, index: int, started: Dict[int, float], timeout: Optional[float]
+):
+    if timeout is None:
+        return future.result()
+
+    while True:
+        start = started.get(index)
+        if start is None:
+            wait_for = _POLL_INTERVAL_SECONDS
+        else:
+            wait_for = max(0.0, start + timeout - time.monotonic())
+        try:
+            return future.result(timeout=wait_for)
+        except TimeoutError:
+            if start is not None:
+                raise TimeoutError(f"Timed out after {timeout} seconds")
+
+
+def run_concurrently(
+    items: Iterable[T],
+    fn: Callable[[T], R],
+    max_concurrency: int,
+    timeout: Optional[float] = None,
+    on_error: Optional[Callable[[T, Exception], R]] = None,
+) -> List[R]:
+    """Apply `fn` to every item with at most `max_concurrency` running at once.
+
+    Results are returned in input order. If `on_error` is given, an item that
+    raises or exceeds `timeout` is replaced by `on_error(item, error)`;
+    otherwise the first error is re-raised.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    started: Dict[int, float] = {}
+
+    def run(index: int, item: T) -> R:
+        started[index] = time.monotonic()
+        return fn(item)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(items))))
+    futures = [executor.submit(run, i, item) for i, item in enumerate(items)]
+    results = []
+    try:
+        for index, (item, future) in enumerate(zip(items, futures)):
+            try:
+                results.append(_result_within(future, index, started, timeout))
+            except Exception as e:
+                if on_error is None:
+                    raise
+                results.append(on_error(item, e))
+    finally:
+        # Timed-out workers cannot be interrupted; don't block on them.
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
@@ -5,50 +5,83 @@ from portia import (
     LogLevel,
 )
 from portia.model import Message
-import json
 import os
+import hashlib
 from datetime import datetime
+from functools import partial
+from typing import Iterator, List, Optional
+from pydantic import BaseModel, Field
+from combinedTools.cache_store import SqliteCache
+from combinedTools.concurrency import run_concurrently
+from combinedTools.summary_payload import (
+    build_attendee_payload,
+    build_summary_payload,
+    fit_to_budget,
+    split_summary_inputs,
+)
 
 load_dotenv()
 
+SUMMARY_MAP_REDUCE = os.getenv("SUMMARY_MAP_REDUCE", "false").lower() == "true"
+SUMMARY_SECTION_CONCURRENCY = int(os.getenv("SUMMARY_SECTION_CONCURRENCY", "4"))
+ATTENDEE_TOKEN_BUDGET = int(os.getenv("ATTENDEE_TOKEN_BUDGET", "3000"))
+OVERVIEW_TOKEN_BUDGET = int(os.getenv("OVERVIEW_TOKEN_BUDGET", "4000"))
 
-def create_meeting_summary(enriched_data, github_analyses, perplexity_result=None):
-    """
-    Create a meeting summary document from the data passed from main.py
+MISSING_SECTION = "_This section could not be generated._"
 
-    Args:
-        enriched_data: The enriched attendee data from research_attendees()
-        github_analyses: List of GitHub profile analyses
-        perplexity_result: Optional perplexity search results
-    """
+# Bump to regenerate cached sections when section generation changes in ways
+# the cache key can't see (the prompts and model are already part of it)
+SECTION_PROMPT_VERSION = "1"
+SECTION_CACHE_MAX_ENTRIES = int(os.getenv("SECTION_CACHE_MAX_ENTRIES", "1000"))
 
-    try:
-        enriched_json = json.dumps(enriched_data, ensure_ascii=False, default=str)
-        github_json = json.dumps(github_analyses, ensure_ascii=False, default=str)
+# Generated attendee sections keyed by a hash of their inputs, prompts and model
+section_cache = SqliteCache("summary_sections", max_entries=SECTION_CACHE_MAX_ENTRIES)
 
-        if perplexity_result:
-            perplexity_json = json.dumps(
-                perplexity_result, ensure_ascii=False, default=str
-            )
-        else:
-            perplexity_json = json.dumps(
-                {"content": "No additional research data available"}, ensure_ascii=False
-            )
 
-        combined_json = json.dumps(
-            {
-                "enriched_data": enriched_json,
-                "github_data": github_json,
-                "perplexity_result": perplexity_json,
-            },
-            ensure_ascii=False,
-        )
+class AttendeeSection(BaseModel):
+    profile: str = Field(
+        description="Markdown profile: '### <name>' then a Field | Details table"
+    )
+    insights: str = Field(
+        description="Markdown insights: '### <name>' then bullet points"
+    )
+
+
+class MeetingSections(BaseModel):
+    overview: str = Field(description="Markdown meeting overview")
+    conversation_starters: str = Field(
+        description="Markdown list of conversation starters and ice breakers"
+    )
+    discussion_points: str = Field(description="Markdown list of discussion points")
+    collaboration_opportunities: str = Field(
+        description="Markdown list of collaboration opportunities"
+    )
+
+
+SYSTEM_PROMPT = """You are an expert meeting preparation assistant. Your task is to analyze attendee data and create comprehensive meeting preparation documents that:
+
+1. **Analyze Attendee Backgrounds**: Extract and present key information about each person's experience, skills, and achievements
+2. **Identify Key Insights**: Highlight what makes each person unique and interesting
+3. **Generate Conversation Starters**: Create specific, relevant topics to discuss based on their backgrounds
+4. **Suggest Discussion Points**: Identify areas of mutual interest and potential collaboration
+5. **Provide Actionable Information**: Give concrete details and insights that can be used during the meeting
+
+Focus on providing the actual research and analysis, not instructions for the user to do research. Present all the information in a clear, organized format that's ready to use."""
 
+
+def _build_prompt(
+    enriched_data, github_analyses, perplexity_result=None
+) -> Optional[str]:
+    """Return the user prompt for the summary, or None if the data can't be encoded."""
+    try:
+        payload_json, _ = build_summary_payload(
+            enriched_data, github_analyses, perplexity_result
+        )
     except Exception as e:
         print(f"Error converting data to JSON: {e}")
         return None
 
-    prompt = f"""
+    return f"""
 Generate a comprehensive meeting preparation document in markdown format from the following JSON data.
 Give only markdown straight nothing like ``` markdown only just markdown content
 ## Document Structure:
@@ -98,53 +131,214 @@ Give only markdown straight nothing like ``` markdown only just markdown content
 - Include specific, actionable insights
 - Keep it professional but approachable
 
-JSON Data: {combined_json}
+JSON Data: {payload_json}
+"""
+
+
+ATTENDEE_SECTION_PROMPT = """
+Write the meeting preparation content for ONE attendee from the following JSON data.
+Give only markdown straight nothing like ``` markdown only just markdown content
+
+profile: Start with "### <attendee name>", then a table with columns Field | Details and rows:
+Current Role, Location, Education, Key Skills, Certifications, Languages, Achievements,
+GitHub, GitHub Highlights, Online Presence, Followers, Interesting Facts.
+
+insights: Start with "### <attendee name>", then bullet points for:
+- **Unique Aspects**: What makes this person unique and interesting
+- **Career Progression**: Their career progression and achievements
+- **Technical Expertise**: Technical expertise and specializations
+- **Recent Projects**: Recent projects and contributions
+
+Use only the data given and keep it professional but approachable.
+
+JSON Data: {payload_json}
 """
 
+OVERVIEW_PROMPT = """
+Write the meeting-wide sections of a meeting preparation document from the following JSON data.
+Give only markdown straight nothing like ``` markdown only just markdown content
+Do not write per-attendee profiles; those are written separately.
+
+overview: Title, organizer, date, and context of the meeting
+conversation_starters: Specific topics to discuss and ice breakers based on the attendees' backgrounds
+discussion_points: Current projects and challenges, technology preferences, industry trends
+collaboration_opportunities: Areas where the attendees might work together
+
+Keep each section short, specific and actionable.
+
+JSON Data: {payload_json}
+"""
+
+
+def _get_model():
     config = Config.from_default(
         llm_provider=LLMProvider.OPENAI,
         default_log_level=LogLevel.DEBUG,
         env={"OPENAI_API_KEY": os.getenv("OPENAI_API_KEY")},
     )
+    return config.get_default_model()
 
-    print("Generating meeting summary document...")
-    try:
-        model = config.get_default_model()
 
-        messages = [
-            Message(
-                role="system",
-                content="""You are an expert meeting preparation assistant. Your task is to analyze attendee data and create comprehensive meeting preparation documents that:
+def _build_messages(prompt: str) -> list:
+    return [
+        Message(role="system", content=SYSTEM_PROMPT),
+        Message(role="user", content=prompt),
+    ]
+
+
+def _summary_filename() -> str:
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"meeting_summary_{timestamp}.md"
 
-1. **Analyze Attendee Backgrounds**: Extract and present key information about each person's experience, skills, and achievements
-2. **Identify Key Insights**: Highlight what makes each person unique and interesting
-3. **Generate Conversation Starters**: Create specific, relevant topics to discuss based on their backgrounds
-4. **Suggest Discussion Points**: Identify areas of mutual interest and potential collaboration
-5. **Provide Actionable Information**: Give concrete details and insights that can be used during the meeting
 
-Focus on providing the actual research and analysis, not instructions for the user to do research. Present all the information in a clear, organized format that's ready to use.""",
-            ),
-            Message(role="user", content=prompt),
-        ]
+def _section_cache_key(model, payload_json: str) -> str:
+    prompts = hashlib.sha256(
+        f"{SYSTEM_PROMPT}\n{ATTENDEE_SECTION_PROMPT}".encode("utf-8")
+    ).hexdigest()
+    content = f"{SECTION_PROMPT_VERSION}\n{model}\n{prompts}\n{payload_json}"
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
 
-        response = model.get_response(messages)
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"meeting_summary_{timestamp}.md"
+def _generate_attendee_section(
+    model, attendee: dict, github_analyses: list
+) -> AttendeeSection:
+    """
+    Profile and insights for one attendee, reused from the section cache when
+    the same compact inputs were summarized before
+    """
+    payload_json, _ = fit_to_budget(
+        lambda scale: build_attendee_payload(attendee, github_analyses, scale),
+        ATTENDEE_TOKEN_BUDGET,
+    )
+    cache_key = _section_cache_key(model, payload_json)
+    cached = section_cache.get(cache_key)
+    if cached is not None:
+        print(f"Using cached summary section for {attendee.get('name')}")
+        return AttendeeSection(**cached)
+
+    prompt = ATTENDEE_SECTION_PROMPT.format(payload_json=payload_json)
+    section = model.get_structured_response(_build_messages(prompt), AttendeeSection)
+    section_cache.set(cache_key, section.model_dump())
+    return section
+
+
+def _generate_overview(model, payload_json: str) -> MeetingSections:
+    prompt = OVERVIEW_PROMPT.format(payload_json=payload_json)
+    return model.get_structured_response(_build_messages(prompt), MeetingSections)
+
+
+def _assemble_document(
+    overview: MeetingSections, attendee_sections: List[AttendeeSection]
+) -> str:
+    profiles = [section.profile.strip() for section in attendee_sections]
+    insights = [section.insights.strip() for section in attendee_sections]
+    sections = [
+        ("## 1. Meeting Overview", overview.overview),
+        ("## 2. Attendee Profiles", "\n\n---\n\n".join(profiles)),
+        ("## 3. Key Insights & Analysis", "\n\n".join(insights)),
+        ("## 4. Conversation Starters & Ice Breakers", overview.conversation_starters),
+        ("## 5. Potential Discussion Points", overview.discussion_points),
+        ("## 6. Collaboration Opportunities", overview.collaboration_opportunities),
+    ]
+    return "\n\n---\n\n".join(
+        f"{heading}\n\n{body.strip()}" for heading, body in sections
+    )
+
+
+def _generate_sections_document(
+    enriched_data, github_analyses, perplexity_result=None
+) -> str:
+    """
+    Map-reduce generation: one call per attendee for their profile and insights,
+    plus one short call for the meeting-wide sections, all run in parallel
+    """
+    _, attendees, per_attendee, _ = split_summary_inputs(enriched_data, github_analyses)
+    overview_json, _ = build_summary_payload(
+        enriched_data, github_analyses, perplexity_result, OVERVIEW_TOKEN_BUDGET
+    )
+    model = _get_model()
+
+    # The overview goes first so it is not queued behind a large meeting
+    jobs = [partial(_generate_overview, model, overview_json)]
+    jobs += [
+        partial(_generate_attendee_section, model, attendee, analyses)
+        for attendee, analyses in zip(attendees, per_attendee)
+    ]
+
+    def on_error(job, error: Exception):
+        print(f"Error generating summary section: {error}")
+        return None
+
+    results = run_concurrently(
+        jobs,
+        lambda job: job(),
+        max_concurrency=SUMMARY_SECTION_CONCURRENCY,
+        on_error=on_error,
+    )
+    overview = results[0] or MeetingSections(
+        overview=MISSING_SECTION,
+        conversation_starters=MISSING_SECTION,
+        discussion_points=MISSING_SECTION,
+        collaboration_opportunities=MISSING_SECTION,
+    )
+    attendee_sections = [
+        section
+        or AttendeeSection(
+            profile=f"### {attendee.get('name')}\n\n{MISSING_SECTION}",
+            insights=f"### {attendee.get('name')}\n\n{MISSING_SECTION}",
+        )
+        for section, attendee in zip(results[1:], attendees)
+    ]
+    return _assemble_document(overview, attendee_sections)
+
+
+def create_meeting_summary(
+    enriched_data,
+    github_analyses,
+    perplexity_result=None,
+    map_reduce: bool = SUMMARY_MAP_REDUCE,
+):
+    """
+    Create a meeting summary document from the data passed from main.py
+
+    Args:
+        enriched_data: The enriched attendee data from research_attendees()
+        github_analyses: List of GitHub profile analyses
+        perplexity_result: Optional perplexity search results
+        map_reduce: Generate each attendee's sections in parallel and the
+            meeting-wide sections in a separate short call
+    """
+
+    if not map_reduce:
+        prompt = _build_prompt(enriched_data, github_analyses, perplexity_result)
+        if prompt is None:
+            return None
+
+    print("Generating meeting summary document...")
+    try:
+        if map_reduce:
+            content = _generate_sections_document(
+                enriched_data, github_analyses, perplexity_result
+            )
+        else:
+            model = _get_model()
+            content = model.get_response(_build_messages(prompt)).content
+
+        filename = _summary_filename()
 
         with open(filename, "w", encoding="utf-8") as f:
-            f.write(response.content)
+            f.write(content)
 
         print(f"=== MEETING SUMMARY SAVED ===")
         print(f"File saved as: {filename}")
-        print(f"File size: {len(response.content)} characters")
+        print(f"File size: {len(content)} characters")
         print("=== END SUMMARY ===")
 
         print("\n=== GENERATED CONTENT ===")
-        print(response.content)
+        print(content)
         print("=== END CONTENT ===")
 
-        return response.content
+        return content
 
     except Exception as e:
         print(f"Error generating meeting summary: {e}")
@@ -152,5 +346,50 @@ Focus on providing the actual research and analysis, not instructions for the us
         return None
 
 
+def stream_meeting_summary(
+    enriched_data, github_analyses, perplexity_result=None
+) -> Iterator[str]:
+    """
+    Stream the meeting summary markdown as the model generates it
+
+    Chunks are appended to the summary file as they arrive and yielded to the
+    caller, so the first lines are available long before generation finishes.
+    Takes the same arguments as create_meeting_summary(). Errors are raised,
+    also after the first chunks, so callers can tell a failed stream from a
+    finished one.
+    """
+
+    prompt = _build_prompt(enriched_data, github_analyses, perplexity_result)
+    if prompt is None:
+        raise ValueError("Could not encode the meeting summary data")
+
+    print("Streaming meeting summary document...")
+    filename = _summary_filename()
+    try:
+        chat_model = _get_model().to_langchain()
+        messages = [message.to_langchain() for message in _build_messages(prompt)]
+
+        size = 0
+        with open(filename, "w", encoding="utf-8") as f:
+            for chunk in chat_model.stream(messages):
+                text = chunk.content
+                if not isinstance(text, str) or not text:
+                    continue
+                f.write(text)
+                f.flush()
+                size += len(text)
+                yield text
+
+        print(f"=== MEETING SUMMARY SAVED ===")
+        print(f"File saved as: {filename}")
+        print(f"File size: {size} characters")
+        print("=== END SUMMARY ===")
+
+    except Exception as e:
+        print(f"Error streaming meeting summary: {e}")
+        print("Please check your API keys and try again.")
+        raise
+
+
 if __name__ == "__main__":
     print("This script should be called from main.py with actual data")
@@ -2,26 +2,48 @@ import os
 import json
 import re
 import logging
+from urllib.parse import unquote
 from dotenv import load_dotenv
 from portia import (
     Config,
     DefaultToolRegistry,
     PlanRunState,
     Portia,
-    McpToolRegistry,
     LLMProvider,
     StorageClass,
     LogLevel,
 )
 from portia.cli import CLIExecutionHooks
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from portia.builder.plan_builder_v2 import PlanBuilderV2
 from portia.builder.reference import Input, StepOutput
+from combinedTools.mcp_pool import (
+    APIFY_LINKEDIN,
+    call_with_fresh_registry,
+    get_mcp_registry,
+    parse_mcp_items,
+)
+from combinedTools.plan_cache import find_mcp_tool_id, get_plan
+from combinedTools.concurrency import run_concurrently
+from combinedTools.cache_store import SqliteCache
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 
+ENRICHMENT_CONCURRENCY = int(os.getenv("ENRICHMENT_CONCURRENCY", "4"))
+ENRICHMENT_TIMEOUT_SECONDS = float(os.getenv("ENRICHMENT_TIMEOUT_SECONDS", "300"))
+ENRICHMENT_CACHE_TTL_SECONDS = float(
+    os.getenv("ENRICHMENT_CACHE_TTL_SECONDS", str(7 * 24 * 3600))
+)
+ENRICHMENT_CACHE_MAX_ENTRIES = int(os.getenv("ENRICHMENT_CACHE_MAX_ENTRIES", "1000"))
+
+enrichment_cache = SqliteCache(
+    "enrichment",
+    ttl_seconds=ENRICHMENT_CACHE_TTL_SECONDS,
+    max_entries=ENRICHMENT_CACHE_MAX_ENTRIES,
+)
+
 
 class SearchQueries(BaseModel):
     queries: List[str] = Field(
@@ -85,11 +107,14 @@ def filter_valid_urls(url_list: UrlList):
         if "linkedin.com/in/" in s:
             s = s.split("?")[0].split("#")[0]
             urls.append(s)
+    # Several URLs (country subdomains, trailing slashes, percent-encoding)
+    # can point at the same profile; keep the first of each
     deduped = []
     seen = set()
     for u in urls:
-        if u not in seen:
-            seen.add(u)
+        key = linkedin_profile_key(u) or u
+        if key not in seen:
+            seen.add(key)
             deduped.append(u)
     return {"urls": deduped}
 
@@ -106,80 +131,18 @@ def extract_urls_from_dict(url_dict):
     return url_dict.get("urls", [])
 
 
-def research_attendees(input_json: dict) -> dict:
-    """Enriches meeting attendee information with LinkedIn data using Portia and Apify."""
-    config = Config.from_default(
-        llm_provider=LLMProvider.OPENAI,
-        storage_class=StorageClass.CLOUD,
-        default_log_level=LogLevel.DEBUG,
-    )
-    portia = Portia(
-        config=config,
-        tools=DefaultToolRegistry(config)
-        + McpToolRegistry.from_stdio_connection(
-            server_name="apify",
-            command="npx",
-            args=[
-                "-y",
-                "@apify/actors-mcp-server",
-                "--actors",
-                "curious_coder/linkedin-profile-scraper",
-            ],
-            env={"APIFY_TOKEN": os.getenv("APIFY_TOKEN")},
-        ),
-        execution_hooks=CLIExecutionHooks(),
-    )
-    available_tools = [t.id for t in portia.tool_registry.get_tools()]
-    logging.info(f"Available tools: {available_tools}")
-    apify_tool_id = next(
-        (
-            tid
-            for tid in available_tools
-            if "linkedin" in tid and "scraper" in tid and "mcp:apify" in tid
-        ),
-        None,
-    )
-    if not apify_tool_id:
-        raise ValueError(
-            "Could not find the Apify LinkedIn scraper tool in the registry."
-        )
-    logging.info(f"Found Apify tool with ID: {apify_tool_id}")
-    try:
-        with open("linkedin_cookies.json", "r") as f:
-            cookie_list = json.load(f)
-    except FileNotFoundError:
-        logging.error("CRITICAL: linkedin_cookies.json not found. Cannot proceed.")
-        raise
-    except json.JSONDecodeError:
-        logging.error("CRITICAL: Could not decode JSON from linkedin_cookies.json.")
-        raise
-    # DEBUG: Print cookie data before passing to plan
-    print("\n=== COOKIE DEBUG INFO ===")
-    print(f"Cookie list type: {type(cookie_list)}")
-    print(f"Cookie list length: {len(cookie_list)}")
-    print("First 3 cookies:")
-    for i, cookie in enumerate(cookie_list[:3]):
-        print(f" Cookie {i+1}: {cookie}")
-    print("=== END COOKIE DEBUG ===\n")
-    try:
-        extracted_cookies = extract_cookies_for_apify(cookie_list)
-        print("=== EXTRACTED COOKIES DEBUG ===")
-        print(f"Extracted cookies type: {type(extracted_cookies)}")
-        print(f"Extracted cookies length: {len(extracted_cookies)}")
-        print("First 3 extracted cookies:")
-        for i, cookie in enumerate(extracted_cookies[:3]):
-            print(f" Extracted Cookie {i+1}: {cookie}")
-        print("=== END EXTRACTED COOKIES DEBUG ===\n")
-    except Exception as e:
-        print(f"Error in extract_cookies_for_apify: {e}")
-    logging.info("Building the plan with PlanBuilderV2...")
-    plan = (
-        PlanBuilderV2("Enrich meeting attendees with LinkedIn data")
+LINKEDIN_URL_PLAN_NAME = "Resolve attendee LinkedIn URL"
+LINKEDIN_SCRAPE_PLAN_NAME = "Scrape LinkedIn profiles for all attendees"
+
+
+def build_linkedin_url_plan():
+    """Build the plan that finds LinkedIn profile URLs for a single attendee."""
+    return (
+        PlanBuilderV2(LINKEDIN_URL_PLAN_NAME)
         .input(
             name="original_json",
             description="The original JSON object with meeting details and attendees.",
         )
-        .input(name="cookies", description="LinkedIn authentication cookies.")
         .function_step(
             function=generate_search_queries,
             args={"original_json": Input("original_json")},
@@ -201,11 +164,17 @@ def research_attendees(input_json: dict) -> dict:
             args={"url_list": StepOutput("Find LinkedIn URLs")},
             step_name="Filter Valid URLs",
         )
-        .function_step(
-            function=extract_urls_from_dict,
-            args={"url_dict": StepOutput("Filter Valid URLs")},
-            step_name="Extract URLs Array",
-        )
+        .final_output()
+        .build()
+    )
+
+
+def build_linkedin_scrape_plan(apify_tool_id: str):
+    """Build the plan that scrapes all attendee LinkedIn profiles in one actor run."""
+    return (
+        PlanBuilderV2(LINKEDIN_SCRAPE_PLAN_NAME)
+        .input(name="urls", description="Deduplicated LinkedIn profile URLs.")
+        .input(name="cookies", description="LinkedIn authentication cookies.")
         .function_step(
             function=extract_cookies_for_apify,
             args={"cookies_list": Input("cookies")},
@@ -214,94 +183,393 @@ def research_attendees(input_json: dict) -> dict:
         .invoke_tool_step(
             tool=apify_tool_id,
             args={
-                "urls": StepOutput("Extract URLs Array"),
+                "urls": Input("urls"),
                 "cookie": StepOutput("Extract Cookies for Apify"),
                 "proxy": {"useApifyProxy": True, "apifyProxyGroups": ["RESIDENTIAL"]},
             },
             step_name="Scrape LinkedIn Profiles",
         )
-        .llm_step(
-            task="Attach each raw scraped profile object to the corresponding attendee as 'enriched'. If none, set 'enriched' to 'Not found'. Do not omit fields.",
-            inputs=[Input("original_json"), StepOutput("Scrape LinkedIn Profiles")],
-            output_schema=FinalOutput,
-            step_name="Merge Data",
-        )
-        .final_output(output_schema=FinalOutput)
+        .final_output()
         .build()
     )
-    logging.info("Plan built successfully.")
-    logging.info("Executing the plan for each attendee...")
 
-    meeting_title = input_json.get("meeting_title")
-    organizer_email = input_json.get("organizer_email")
-    attendees = input_json.get("attendees", [])
-    enriched_attendees = []
 
-    for attendee in attendees:
-        single_input = {
-            "meeting_title": meeting_title,
-            "organizer_email": organizer_email,
-            "attendees": [attendee],
-        }
-        plan_run = portia.run_plan(
-            plan,
-            plan_run_inputs={
-                "original_json": single_input,
-                "cookies": cookie_list,
-            },
+def linkedin_profile_key(url: str) -> str:
+    """Normalise a LinkedIn profile URL to its decoded public identifier"""
+    match = re.search(r"linkedin\.com/in/([^/?#]+)", str(url), re.IGNORECASE)
+    return unquote(match.group(1)).lower() if match else ""
+
+
+def profile_linkedin_key(profile: Dict[str, Any]) -> str:
+    """Public identifier of a scraped LinkedIn profile, or "" if it has none
+
+    The URL the actor was given comes first, so the profile maps back to the
+    attendee even when LinkedIn reports a different canonical URL.
+    """
+    for field in ("inputUrl", "linkedinUrl", "linkedInUrl", "profileUrl", "url"):
+        key = linkedin_profile_key(profile.get(field, ""))
+        if key:
+            return key
+    if profile.get("publicIdentifier"):
+        return unquote(str(profile["publicIdentifier"])).lower()
+    return ""
+
+
+def match_profiles_to_urls(scraped: Any) -> Dict[str, Dict[str, Any]]:
+    """Index scraped LinkedIn profiles by public identifier"""
+    profiles = {}
+    for profile in parse_mcp_items(scraped):
+        key = profile_linkedin_key(profile)
+        if key and key not in profiles:
+            profiles[key] = profile
+    return profiles
+
+
+def _email_cache_key(email: str) -> str:
+    return f"email:{(email or '').strip().lower()}"
+
+
+def _linkedin_cache_key(profile_key: str) -> str:
+    return f"linkedin:{profile_key}"
+
+
+def get_cached_enrichment(attendee: dict) -> Optional[Dict[str, Any]]:
+    """Return a fresh cached LinkedIn profile for the attendee's email, if any"""
+    if not attendee.get("email"):
+        return None
+    return enrichment_cache.get(_email_cache_key(attendee["email"]))
+
+
+def store_enrichment(enriched: EnrichedAttendee) -> None:
+    """Cache a successful enrichment by email and by LinkedIn identifier"""
+    if not isinstance(enriched.enriched, dict):
+        return
+    if enriched.email:
+        enrichment_cache.set(_email_cache_key(enriched.email), enriched.enriched)
+    profile_key = profile_linkedin_key(enriched.enriched)
+    if profile_key:
+        enrichment_cache.set(_linkedin_cache_key(profile_key), enriched.enriched)
+
+
+def failed_attendee(attendee: dict, error: Exception) -> EnrichedAttendee:
+    """Build the "Failed to enrich" record for an attendee whose run failed"""
+    logging.error(f"Enrichment failed for {attendee.get('name')}: {error}")
+    return EnrichedAttendee(
+        name=attendee["name"],
+        email=attendee["email"],
+        enriched="Failed to enrich",
+    )
+
+
+def resolve_linkedin_url(
+    portia: Portia,
+    url_plan,
+    attendee: dict,
+    meeting_title: str,
+    organizer_email: str,
+) -> str:
+    """Find the attendee's LinkedIn profile URL, or "" if none was found"""
+    single_input = {
+        "meeting_title": meeting_title,
+        "organizer_email": organizer_email,
+        "attendees": [attendee],
+    }
+    output = _run_plan(
+        portia, url_plan, {"original_json": single_input}, attendee["name"]
+    )
+    urls = extract_urls_from_dict(output)
+    return urls[0] if urls else ""
+
+
+def get_cached_profile(url: str) -> Optional[Dict[str, Any]]:
+    """Return a fresh cached LinkedIn profile for a profile URL, if any"""
+    profile_key = linkedin_profile_key(url)
+    if not profile_key:
+        return None
+    return enrichment_cache.get(_linkedin_cache_key(profile_key))
+
+
+def enrich_attendee(
+    portia: Portia,
+    url_plan,
+    attendee: dict,
+    meeting_title: str,
+    organizer_email: str,
+    cookie_list: list,
+    force_refresh: bool = False,
+) -> EnrichedAttendee:
+    """Resolve a single attendee's LinkedIn URL and scrape it unless cached"""
+    url = resolve_linkedin_url(
+        portia, url_plan, attendee, meeting_title, organizer_email
+    )
+    profile = None
+    if url and not force_refresh:
+        profile = get_cached_profile(url)
+        if profile is not None:
+            logging.info(f"Using cached LinkedIn profile for {url}")
+    if url and profile is None:
+        profiles = scrape_linkedin_profiles([url], cookie_list, attendee["name"])
+        profile = profiles.get(linkedin_profile_key(url))
+    return EnrichedAttendee(
+        name=attendee["name"],
+        email=attendee["email"],
+        enriched=profile if profile is not None else "Not found",
+    )
+
+
+def _get_portia() -> Portia:
+    config = Config.from_default(
+        llm_provider=LLMProvider.OPENAI,
+        storage_class=StorageClass.CLOUD,
+        default_log_level=LogLevel.DEBUG,
+    )
+    return Portia(
+        config=config,
+        tools=DefaultToolRegistry(config) + get_mcp_registry(APIFY_LINKEDIN),
+        execution_hooks=CLIExecutionHooks(),
+    )
+
+
+def find_linkedin_scraper_tool_id() -> str:
+    """Resolve the Apify LinkedIn scraper tool ID from the pooled MCP registry"""
+    apify_tool_id = find_mcp_tool_id(
+        APIFY_LINKEDIN,
+        "linkedin_scraper",
+        lambda tid: "linkedin" in tid and "scraper" in tid and "mcp:apify" in tid,
+    )
+    if not apify_tool_id:
+        raise ValueError(
+            "Could not find the Apify LinkedIn scraper tool in the registry."
         )
-        while plan_run.state == PlanRunState.NEED_CLARIFICATION:
-            for clarification in plan_run.get_outstanding_clarifications():
-                print(
-                    f"Clarification needed for {attendee['name']}: {clarification.user_guidance}"
-                )
-                user_response = input("Please provide your response: ")
-                plan_run = portia.resolve_clarification(
-                    clarification, user_response, plan_run
-                )
-            plan_run = portia.resume(plan_run)
-        if plan_run.state == PlanRunState.FAILED:
-            logging.error(
-                f"Plan failed for {attendee['name']}. Error details: {str(plan_run.outputs.final_output)}"
+    logging.info(f"Found Apify tool with ID: {apify_tool_id}")
+    return apify_tool_id
+
+
+def _run_plan(portia: Portia, plan, plan_run_inputs: dict, label: str):
+    plan_run = portia.run_plan(plan, plan_run_inputs=plan_run_inputs)
+    while plan_run.state == PlanRunState.NEED_CLARIFICATION:
+        for clarification in plan_run.get_outstanding_clarifications():
+            print(f"Clarification needed for {label}: {clarification.user_guidance}")
+            user_response = input("Please provide your response: ")
+            plan_run = portia.resolve_clarification(
+                clarification, user_response, plan_run
+            )
+        plan_run = portia.resume(plan_run)
+    if plan_run.state == PlanRunState.COMPLETE and plan_run.outputs.final_output:
+        return plan_run.outputs.final_output.value
+    raise ValueError(f"Plan did not complete for {label} (state: {plan_run.state})")
+
+
+def scrape_linkedin_profiles(
+    urls: List[str], cookie_list: list, label: str
+) -> Dict[str, Dict[str, Any]]:
+    """Scrape LinkedIn profile URLs in one actor run, keyed by public identifier
+
+    A run that loses its MCP connection is retried once against a freshly
+    listed registry; a FAILED plan run is not retried.
+    """
+
+    def scrape():
+        apify_tool_id = find_linkedin_scraper_tool_id()
+        plan = get_plan(
+            LINKEDIN_SCRAPE_PLAN_NAME,
+            [apify_tool_id],
+            lambda: build_linkedin_scrape_plan(apify_tool_id),
+        )
+        return _run_plan(
+            _get_portia(), plan, {"urls": urls, "cookies": cookie_list}, label
+        )
+
+    return match_profiles_to_urls(call_with_fresh_registry(APIFY_LINKEDIN, scrape))
+
+
+def enrich_attendees_batch(
+    portia: Portia,
+    attendees: List[dict],
+    meeting_title: str,
+    organizer_email: str,
+    cookie_list: list,
+    max_concurrency: int,
+    attendee_timeout: float,
+    force_refresh: bool = False,
+) -> List[EnrichedAttendee]:
+    """Resolve every attendee's LinkedIn URL, then scrape them all in one actor run"""
+    url_plan = get_plan(
+        LINKEDIN_URL_PLAN_NAME, ["portia:tavily::search"], build_linkedin_url_plan
+    )
+
+    attendee_urls = run_concurrently(
+        attendees,
+        lambda attendee: resolve_linkedin_url(
+            portia, url_plan, attendee, meeting_title, organizer_email
+        ),
+        max_concurrency=max_concurrency,
+        timeout=attendee_timeout,
+        on_error=failed_attendee,
+    )
+
+    unique_urls = extract_urls_from_dict(
+        filter_valid_urls(
+            UrlList(urls=[url for url in attendee_urls if isinstance(url, str)])
+        )
+    )
+    profiles = {}
+    if not force_refresh:
+        for url in unique_urls:
+            cached = get_cached_profile(url)
+            if cached is not None:
+                profiles[linkedin_profile_key(url)] = cached
+        unique_urls = [
+            url for url in unique_urls if linkedin_profile_key(url) not in profiles
+        ]
+
+    scrape_error = None
+    if unique_urls:
+        logging.info(f"Scraping {len(unique_urls)} LinkedIn profiles in one run")
+        try:
+            profiles.update(
+                scrape_linkedin_profiles(unique_urls, cookie_list, meeting_title)
             )
+        except Exception as e:
+            scrape_error = e
+
+    enriched_attendees = []
+    for attendee, url in zip(attendees, attendee_urls):
+        if isinstance(url, EnrichedAttendee):
+            enriched_attendees.append(url)
+        elif not url:
             enriched_attendees.append(
                 EnrichedAttendee(
-                    name=attendee["name"],
-                    email=attendee["email"],
-                    enriched="Failed to enrich",
+                    name=attendee["name"], email=attendee["email"], enriched="Not found"
                 )
             )
-            continue
-        if plan_run.state == PlanRunState.COMPLETE and plan_run.outputs.final_output:
-            raw_output = plan_run.outputs.final_output.value
-            if isinstance(raw_output, BaseModel):
-                enriched = raw_output.attendees[0].enriched
-                if isinstance(enriched, str):
-                    try:
-                        enriched = json.loads(enriched)
-                    except json.JSONDecodeError:
-                        enriched = "Parsing error in enrched data"
-                enriched_attendees.append(
-                    EnrichedAttendee(
-                        name=attendee["name"],
-                        email=attendee["email"],
-                        enriched=enriched,
-                    )
-                )
-            else:
-                enriched_attendees.append(
-                    EnrichedAttendee(
-                        name=attendee["name"],
-                        email=attendee["email"],
-                        enriched=raw_output,
-                    )
-                )
+        elif scrape_error is not None and linkedin_profile_key(url) not in profiles:
+            enriched_attendees.append(failed_attendee(attendee, scrape_error))
         else:
             enriched_attendees.append(
                 EnrichedAttendee(
-                    name=attendee["name"], email=attendee["email"], enriched="Not found"
+                    name=attendee["name"],
+                    email=attendee["email"],
+                    enriched=profiles.get(linkedin_profile_key(url), "Not found"),
                 )
             )
+    return enriched_attendees
+
+
+def research_attendees(
+    input_json: dict,
+    max_concurrency: int = ENRICHMENT_CONCURRENCY,
+    attendee_timeout: float = ENRICHMENT_TIMEOUT_SECONDS,
+    batch: bool = False,
+    force_refresh: bool = False,
+) -> dict:
+    """Enriches meeting attendee information with LinkedIn data using Portia and Apify.
+
+    Attendees are enriched concurrently, at most `max_concurrency` at a time, and
+    each run is given `attendee_timeout` seconds. Results keep the input order;
+    an attendee whose run fails or times out gets a "Failed to enrich" record.
+
+    With `batch=True` the LinkedIn URLs of all attendees are resolved first and
+    scraped together in a single Apify actor run, then mapped back by URL.
+
+    Successful enrichments are cached on disk by email and LinkedIn URL. An
+    attendee cached by email is skipped entirely; otherwise their URL is
+    resolved and checked against the URL cache before scraping. Cached
+    entries are reused until the TTL expires or `force_refresh` is set.
+    """
+    meeting_title = input_json.get("meeting_title")
+    organizer_email = input_json.get("organizer_email")
+    attendees = input_json.get("attendees", [])
+
+    cached = {}
+    if not force_refresh:
+        for index, attendee in enumerate(attendees):
+            enriched = get_cached_enrichment(attendee)
+            if enriched is not None:
+                logging.info(f"Using cached enrichment for {attendee['email']}")
+                cached[index] = EnrichedAttendee(
+                    name=attendee["name"], email=attendee["email"], enriched=enriched
+                )
+    pending = [a for i, a in enumerate(attendees) if i not in cached]
+    if not pending:
+        return FinalOutput(
+            meeting_title=meeting_title,
+            organizer_email=organizer_email,
+            attendees=[cached[i] for i in range(len(attendees))],
+        )
+
+    # Fail fast when the scraper tool is unavailable
+    find_linkedin_scraper_tool_id()
+    portia = _get_portia()
+    try:
+        with open("linkedin_cookies.json", "r") as f:
+            cookie_list = json.load(f)
+    except FileNotFoundError:
+        logging.error("CRITICAL: linkedin_cookies.json not found. Cannot proceed.")
+        raise
+    except json.JSONDecodeError:
+        logging.error("CRITICAL: Could not decode JSON from linkedin_cookies.json.")
+        raise
+    # DEBUG: Print cookie data before passing to plan
+    print("\n=== COOKIE DEBUG INFO ===")
+    print(f"Cookie list type: {type(cookie_list)}")
+    print(f"Cookie list length: {len(cookie_list)}")
+    print("First 3 cookies:")
+    for i, cookie in enumerate(cookie_list[:3]):
+        print(f" Cookie {i+1}: {cookie}")
+    print("=== END COOKIE DEBUG ===\n")
+    try:
+        extracted_cookies = extract_cookies_for_apify(cookie_list)
+        print("=== EXTRACTED COOKIES DEBUG ===")
+        print(f"Extracted cookies type: {type(extracted_cookies)}")
+        print(f"Extracted cookies length: {len(extracted_cookies)}")
+        print("First 3 extracted cookies:")
+        for i, cookie in enumerate(extracted_cookies[:3]):
+            print(f" Extracted Cookie {i+1}: {cookie}")
+        print("=== END EXTRACTED COOKIES DEBUG ===\n")
+    except Exception as e:
+        print(f"Error in extract_cookies_for_apify: {e}")
+    if batch:
+        enriched_pending = enrich_attendees_batch(
+            portia,
+            pending,
+            meeting_title,
+            organizer_email,
+            cookie_list,
+            max_concurrency,
+            attendee_timeout,
+            force_refresh,
+        )
+    else:
+        url_plan = get_plan(
+            LINKEDIN_URL_PLAN_NAME, ["portia:tavily::search"], build_linkedin_url_plan
+        )
+        logging.info("Enriching each attendee...")
+
+        enriched_pending = run_concurrently(
+            pending,
+            lambda attendee: enrich_attendee(
+                portia,
+                url_plan,
+                attendee,
+                meeting_title,
+                organizer_email,
+                cookie_list,
+                force_refresh,
+            ),
+            max_concurrency=max_concurrency,
+            timeout=attendee_timeout,
+            on_error=failed_attendee,
+        )
+
+    for enriched in enriched_pending:
+        store_enrichment(enriched)
+
+    enriched_iter = iter(enriched_pending)
+    enriched_attendees = [
+        cached[i] if i in cached else next(enriched_iter)
+        for i in range(len(attendees))
+    ]
 
     return FinalOutput(
         meeting_title=meeting_title,
@@ -310,6 +578,41 @@ def research_attendees(input_json: dict) -> dict:
     )
 
 
+def research_meetings(meetings: List[dict], **kwargs) -> List[FinalOutput]:
+    """Enrich the attendees of several meetings, researching each person once.
+
+    Attendees are deduplicated by email across all meetings, enriched with a
+    single `research_attendees` call (keyword arguments are passed through),
+    and the results are fanned back out into one FinalOutput per meeting.
+    """
+    unique_attendees = {}
+    for meeting in meetings:
+        for attendee in meeting.get("attendees", []):
+            unique_attendees.setdefault(attendee["email"].strip().lower(), attendee)
+
+    combined = research_attendees(
+        {
+            "meeting_title": ", ".join(m.get("meeting_title", "") for m in meetings),
+            "organizer_email": meetings[0].get("organizer_email") if meetings else "",
+            "attendees": list(unique_attendees.values()),
+        },
+        **kwargs,
+    )
+    enriched_by_email = {a.email.strip().lower(): a for a in combined.attendees}
+
+    return [
+        FinalOutput(
+            meeting_title=meeting.get("meeting_title"),
+            organizer_email=meeting.get("organizer_email"),
+            attendees=[
+                enriched_by_email[attendee["email"].strip().lower()]
+                for attendee in meeting.get("attendees", [])
+            ],
+        )
+        for meeting in meetings
+    ]
+
+
 if __name__ == "__main__":
     sample_input = {
         "meeting_title": "Portia meet",
@@ -0,0 +1,132 @@
+"""
+Async execution layer for the API.
+
+The tools are blocking and a single call can take minutes, so the endpoints
+hand them to thread pools instead of Starlette's shared one. Each endpoint gets
+a `ConcurrencyLimiter` with its own pool, sized to its limit: up to `limit`
+calls run at once, up to `max_waiting` more queue behind them, and anything
+beyond that is rejected with `ConcurrencyLimitExceeded`. An admitted call
+always has a worker of its own, so a few slow workflows cannot starve the rest
+of the API.
+
+A slot is given back when its worker thread finishes, not when the request is
+cancelled: a client that disconnects mid-call cannot interrupt the thread, so
+the slot stays taken until the thread is free for the next call.
+"""
+
+import os
+import asyncio
+import functools
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ConcurrencyLimitExceeded(Exception):
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"Too many concurrent '{name}' requests")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """Bound the running and queued calls of one endpoint."""
+
+    def __init__(self, name: str, limit: int, max_waiting: int, retry_after: int = 30):
+        self.name = name
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.retry_after = retry_after
+        self._pending = 0
+        self._semaphore = asyncio.Semaphore(limit)
+        self._executor = ThreadPoolExecutor(
+            max_workers=limit, thread_name_prefix=f"pipeline-{name}"
+        )
+
+    @classmethod
+    def from_env(
+        cls, name: str, limit: int, max_waiting: int, retry_after: int = 30
+    ) -> "ConcurrencyLimiter":
+        """Read `<NAME>_CONCURRENCY` and `<NAME>_QUEUE_SIZE` overrides."""
+        prefix = name.upper().replace("-", "_")
+        return cls(
+            name,
+            int(os.getenv(f"{prefix}_CONCURRENCY", str(limit))),
+            int(os.getenv(f"{prefix}_QUEUE_SIZE", str(max_waiting))),
+            retry_after,
+        )
+
+    def _check_capacity(self) -> None:
+        if self._pending >= self.limit + self.max_waiting:
+            raise ConcurrencyLimitExceeded(self.name, self.retry_after)
+
+    async def _acquire(self) -> None:
+        """Wait in the queue for a running slot."""
+        self._pending += 1
+        try:
+            await self._semaphore.acquire()
+        except BaseException:
+            self._pending -= 1
+            raise
+
+    def _release(self) -> None:
+        self._semaphore.release()
+        self._pending -= 1
+
+    def _release_after(self, future: Optional[Future]) -> None:
+        """Give the slot back once `future`'s worker is done (now if none ran)."""
+        if future is None:
+            self._release()
+            return
+        loop = asyncio.get_running_loop()
+
+        def release(_: Future) -> None:
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                pass  # The loop has already shut down
+
+        future.add_done_callback(release)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run `fn` on this endpoint's pool once a slot is free.
+
+        Raises ConcurrencyLimitExceeded straight away when the queue is full.
+        """
+        self._check_capacity()
+        await self._acquire()
+        future = None
+        try:
+            future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+            return await asyncio.wrap_future(future)
+        finally:
+            self._release_after(future)
+
+    def stream(self, iterator: Iterator[Any]) -> AsyncIterator[Any]:
+        """Return `iterator` advanced on this endpoint's pool under a slot.
+
+        Capacity is checked now so callers can answer 429 before starting a
+        response. The slot itself is taken when iteration starts and held
+        until it ends, so a body that is never iterated (the client went away
+        first) holds nothing.
+        """
+        self._check_capacity()
+        done = object()
+
+        async def items() -> AsyncIterator[Any]:
+            await self._acquire()
+            future = None
+            try:
+                while True:
+                    future = self._executor.submit(next, iterator, done)
+                    item = await asyncio.wrap_future(future)
+                    if item is done:
+                        return
+                    yield item
+            finally:
+                self._release_after(future)
+
+        return items()
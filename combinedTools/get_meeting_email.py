@@ -11,13 +11,18 @@ from portia import (
 
 from portia.cli import CLIExecutionHooks
 from dotenv import load_dotenv
+import os
+import time
 import datetime
 import json
 import re
 from portia.builder.plan_builder_v2 import PlanBuilderV2
 from portia.builder.reference import Input, StepOutput
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from pydantic import BaseModel, Field
+from combinedTools.plan_cache import get_plan
+from combinedTools.concurrency import run_concurrently
+from combinedTools.cache_store import SqliteCache
 
 load_dotenv()
 
@@ -35,6 +40,7 @@ class AttendeeList(BaseModel):
 
 
 class MeetingReport(BaseModel):
+    event_id: Optional[str] = None
     meeting_title: str
     meeting_time: str
     organizer_email: str
@@ -92,27 +98,103 @@ def process_final_output(report) -> dict:
         return report
 
 
-def get_meetings_and_emails(todaysDate: str) -> dict:
-    config = Config.from_default(
-        llm_provider=LLMProvider.OPENAI,
-        storage_class=StorageClass.CLOUD,
-    )
-    portia = Portia(
-        config=config,
-        tools=DefaultToolRegistry(config),
-        execution_hooks=CLIExecutionHooks(),
-    )
+# Keys every calendar event has; dicts without them are messages or errors
+EVENT_KEYS = ("id", "start")
 
-    if "T" in todaysDate:
-        date_part = todaysDate.split("T")[0]
+
+def _is_event(value: Any) -> bool:
+    return isinstance(value, dict) and any(key in value for key in EVENT_KEYS)
+
+
+def parse_events(events: Any) -> List[Dict[str, Any]]:
+    """Normalise the calendar tool output into a list of event dicts.
+
+    Anything that does not look like an event, such as a "no events" message
+    or an error payload, is dropped.
+    """
+    if hasattr(events, "model_dump"):
+        events = events.model_dump()
+    if isinstance(events, str):
+        try:
+            events = json.loads(events)
+        except json.JSONDecodeError:
+            return []
+    if isinstance(events, dict):
+        for key in ("events", "items"):
+            if key in events:
+                return parse_events(events[key])
+        return [events] if _is_event(events) else []
+    if isinstance(events, list):
+        return [event for event in events if _is_event(event)]
+    return []
+
+
+def _email_of(person: Any) -> str:
+    if isinstance(person, dict):
+        return person.get("email", "")
+    return str(person or "")
+
+
+def event_details(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Map a calendar event to the fields used by MeetingReport."""
+    start = event.get("start", {})
+    if isinstance(start, dict):
+        meeting_time = start.get("dateTime") or start.get("date", "")
     else:
-        date_part = todaysDate
+        meeting_time = str(start or "")
 
-    start_time = f"{date_part}T00:00:00"
-    end_time = f"{date_part}T23:59:59"
+    attendees = []
+    for attendee in event.get("attendees") or []:
+        if isinstance(attendee, dict):
+            attendees.append(attendee)
+        elif attendee:
+            attendees.append({"email": str(attendee)})
+
+    return {
+        "event_id": event.get("id", ""),
+        "meeting_title": event.get("summary") or event.get("title", ""),
+        "meeting_time": meeting_time,
+        "organizer_email": _email_of(event.get("organizer")),
+        "attendees": attendees,
+    }
+
+
+def extract_event_details(events: Any) -> List[Dict[str, Any]]:
+    """Map every fetched event to its meeting details, in calendar order."""
+    return [event_details(event) for event in parse_events(events)]
+
+
+def filter_organizer(event_details: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Return the event's attendees without the organizer."""
+    organizer_email = (event_details.get("organizer_email") or "").lower()
+    return [
+        attendee
+        for attendee in event_details.get("attendees", [])
+        if _email_of(attendee).lower() != organizer_email
+        and not attendee.get("organizer")
+    ]
+
+
+EVENTS_PLAN_NAME = "Get Meeting Details"
+EMAIL_SEARCH_PLAN_NAME = "Search Attendee Emails"
+SUMMARY_PLAN_NAME = "Summarize Attendee Emails"
+
+CALENDAR_TOOL_ID = "portia:google:gcalendar:get_events_by_properties"
+GMAIL_SEARCH_TOOL_ID = "portia:google:gmail:search_email"
+
+GMAIL_SEARCH_CONCURRENCY = int(os.getenv("GMAIL_SEARCH_CONCURRENCY", "5"))
+# Newest email summaries kept per organizer|attendee pair
+EMAIL_HISTORY_MAX_SUMMARIES = int(os.getenv("EMAIL_HISTORY_MAX_SUMMARIES", "20"))
+MEETING_CONCURRENCY = int(os.getenv("MEETING_CONCURRENCY", "4"))
+
+# Prior email summaries and the last search time per organizer|attendee pair
+email_history = SqliteCache("email_history")
 
-    plan = (
-        PlanBuilderV2("Get Meeting Details and Summarize Attendee Emails")
+
+def build_events_plan():
+    """Build the plan that fetches the day's events and extracts their details."""
+    return (
+        PlanBuilderV2(EVENTS_PLAN_NAME)
         .input(
             name="start_time",
             description="Start time in ISO format (YYYY-MM-DDTHH:MM:SS)",
@@ -121,7 +203,7 @@ def get_meetings_and_emails(todaysDate: str) -> dict:
             name="end_time", description="End time in ISO format (YYYY-MM-DDTHH:MM:SS)"
         )
         .invoke_tool_step(
-            tool="portia:google:gcalendar:get_events_by_properties",
+            tool=CALENDAR_TOOL_ID,
             args={
                 "start_time": Input("start_time"),
                 "end_time": Input("end_time"),
@@ -129,75 +211,85 @@ def get_meetings_and_emails(todaysDate: str) -> dict:
             },
             step_name="Find Todays Events",
         )
-        .llm_step(
-            task="From the fetched events, select the VERY FIRST event. Then, extract the following details into a simple JSON object: meeting_title (from 'summary'), meeting_time (from 'start.date' or 'start.dateTime'), organizer_email (from 'organizer.email'), and attendees (the full list of attendee objects). If no events are found, return an empty object.",
-            inputs=[StepOutput("Find Todays Events")],
-            step_name="Extract First Event Details",
-        )
-        .llm_step(
-            task="From the event details, create a new list of attendees that excludes the organizer. Use the 'organizer_email' to filter the 'attendees' list.",
-            inputs=[StepOutput("Extract First Event Details")],
-            step_name="Filter Organizer",
-        )
-        .llm_step(
-            task="For each attendee in the filtered list, generate a Gmail search query using this format: '((from:ORGANIZER_EMAIL to:ATTENDEE_EMAIL) OR (from:ATTENDEE_EMAIL to:ORGANIZER_EMAIL))'. Output ONLY a JSON array of objects: [{'attendee_email': EMAIL, 'search_query': QUERY}] for all attendees. Use organizer_email from input. No other text.",
-            inputs=[
-                StepOutput("Extract First Event Details"),
-                StepOutput("Filter Organizer"),
-            ],
-            step_name="Generate Search Queries",
+        .function_step(
+            function=extract_event_details,
+            args={"events": StepOutput("Find Todays Events")},
+            step_name="Extract Event Details",
         )
+        .final_output()
+        .build()
+    )
+
+
+def build_email_search_plan():
+    """Build the plan that runs one Gmail search; executed once per attendee."""
+    return (
+        PlanBuilderV2(EMAIL_SEARCH_PLAN_NAME)
+        .input(name="query", description="Gmail search query")
         .invoke_tool_step(
-            tool="portia:google:gmail:search_email",
-            args={
-                "query": "((from:anuj846k@gmail.com to:kshitijakarsh@gmail.com) OR (from:kshitijakarsh@gmail.com to:anuj846k@gmail.com))"
-            },
-            step_name="Search Gmail for First Attendee",
+            tool=GMAIL_SEARCH_TOOL_ID,
+            args={"query": Input("query")},
+            step_name="Search Gmail for Attendee",
         )
-        .invoke_tool_step(
-            tool="portia:google:gmail:search_email",
-            args={
-                "query": "((from:anuj846k@gmail.com to:mounir.mouawad@gmail.com) OR (from:mounir.mouawad@gmail.com to:anuj846k@gmail.com))"
-            },
-            step_name="Search Gmail for Second Attendee",
+        .final_output()
+        .build()
+    )
+
+
+def build_summary_plan():
+    """Build the plan that summarizes new Gmail search results per attendee."""
+    return (
+        PlanBuilderV2(SUMMARY_PLAN_NAME)
+        .input(
+            name="email_results",
+            description="New Gmail search results for each attendee, keyed by email",
         )
         .llm_step(
-            task="For each attendee and their email search results, create a concise summary of the email history found. Clean messages to plain text (strip HTML/links/images/signatures), keep newest to oldest. Then summarize into detailed sentences. If no emails are found, email_summaries = []. IMPORTANT: Each attendee object MUST include 'name', 'email', and 'email_summaries' fields. For the 'name' field, derive it from the email using the pattern: split on numbers/underscores and capitalize each part. Output UPDATED attendees array with all required fields. ONLY the JSON attendees array, no other text.",
-            inputs=[
-                StepOutput("Extract First Event Details"),  
-                StepOutput("Filter Organizer"),  
-                StepOutput(
-                    "Search Gmail for First Attendee"
-                ),  
-                StepOutput(
-                    "Search Gmail for Second Attendee"
-                ),  
-            ],
+            task="For each attendee email key and its email search results, create a concise summary of the messages found. Clean messages to plain text (strip HTML/links/images/signatures), keep newest to oldest. Then summarize into detailed sentences. IMPORTANT: Output one attendee object per email key, and each MUST include 'name', 'email' (the key) and 'email_summaries' fields. For the 'name' field, derive it from the email using the pattern: split on numbers/underscores and capitalize each part. ONLY the JSON attendees array, no other text.",
+            inputs=[Input("email_results")],
             output_schema=AttendeeList,
-            step_name="Summarize Email Results",
-        )
-        .llm_step(
-            task="Construct the final JSON report. Use the 'meeting_title', 'meeting_time', and 'organizer_email' from the initial event details. Use the list of attendees with their email summaries from the previous step. IMPORTANT: Exclude the organizer from the attendees list - only include attendees who are NOT the organizer. The final structure must match the MeetingReport schema exactly.",
-            inputs=[
-                StepOutput("Extract First Event Details"),
-                StepOutput("Summarize Email Results"),
-            ],
-            output_schema=MeetingReport,
-            step_name="Assemble Final Report",
-        )
-        .function_step(
-            function=process_final_output,
-            args={"report": StepOutput("Assemble Final Report")},
-            step_name="Final Validation and Formatting",
+            step_name="Summarize New Emails",
         )
         .final_output()
         .build()
     )
 
-    plan_run = portia.run_plan(
-        plan, plan_run_inputs={"start_time": start_time, "end_time": end_time}
+
+def build_search_query(
+    organizer_email: str, attendee_email: str, after: Optional[int] = None
+) -> str:
+    """Gmail query matching mail in either direction between the two addresses.
+
+    With `after` (a Unix timestamp) only newer messages are matched.
+    """
+    query = (
+        f"((from:{organizer_email} to:{attendee_email}) OR "
+        f"(from:{attendee_email} to:{organizer_email}))"
+    )
+    if after:
+        query += f" after:{int(after)}"
+    return query
+
+
+def _history_key(pair: Tuple[str, str]) -> str:
+    return "|".join(pair)
+
+
+def _get_portia() -> Portia:
+    config = Config.from_default(
+        llm_provider=LLMProvider.OPENAI,
+        storage_class=StorageClass.CLOUD,
+    )
+    return Portia(
+        config=config,
+        tools=DefaultToolRegistry(config),
+        execution_hooks=CLIExecutionHooks(),
     )
 
+
+def _run_plan(portia: Portia, plan, plan_run_inputs: dict):
+    plan_run = portia.run_plan(plan, plan_run_inputs=plan_run_inputs)
+
     while plan_run.state == PlanRunState.NEED_CLARIFICATION:
         for clarification in plan_run.get_outstanding_clarifications():
             print(f"Clarification needed: {clarification.user_guidance}")
@@ -217,6 +309,252 @@ def get_meetings_and_emails(todaysDate: str) -> dict:
     raise ValueError("The meeting and email plan did not complete successfully.")
 
 
+def _meeting_pairs(details: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(organizer, attendee) email pairs of a meeting, lower-cased."""
+    organizer = (details.get("organizer_email") or "").lower()
+    return [
+        (organizer, attendee["email"].lower())
+        for attendee in filter_organizer(details)
+        if attendee.get("email")
+    ]
+
+
+def search_attendee_emails(
+    portia: Portia,
+    pairs: List[Tuple[str, str]],
+    max_concurrency: int = GMAIL_SEARCH_CONCURRENCY,
+) -> Dict[Tuple[str, str], Any]:
+    """Search Gmail once per (organizer, attendee) pair, concurrently.
+
+    Only messages newer than the pair's last search are requested. A failed
+    search maps to None so its cursor is not advanced.
+    """
+    plan = get_plan(
+        EMAIL_SEARCH_PLAN_NAME, [GMAIL_SEARCH_TOOL_ID], build_email_search_plan
+    )
+    pairs = list(dict.fromkeys(pairs))
+
+    def search(pair: Tuple[str, str]) -> Any:
+        history = email_history.get(_history_key(pair)) or {}
+        query = build_search_query(*pair, after=history.get("last_searched"))
+        return _run_plan(portia, plan, {"query": query})
+
+    def on_error(pair: Tuple[str, str], error: Exception) -> Any:
+        print(f"Gmail search failed for {pair[1]}: {error}")
+        return None
+
+    results = run_concurrently(
+        pairs, search, max_concurrency=max_concurrency, on_error=on_error
+    )
+    return dict(zip(pairs, results))
+
+
+def _day_window(todaysDate: str):
+    if "T" in todaysDate:
+        date_part = todaysDate.split("T")[0]
+    else:
+        date_part = todaysDate
+
+    start_time = f"{date_part}T00:00:00"
+    end_time = f"{date_part}T23:59:59"
+    return date_part, start_time, end_time
+
+
+def _fetch_event_details(portia: Portia, todaysDate: str) -> List[Dict[str, Any]]:
+    """Meeting details of every event on the given day, possibly none."""
+    _, start_time, end_time = _day_window(todaysDate)
+    events_plan = get_plan(EVENTS_PLAN_NAME, [CALENDAR_TOOL_ID], build_events_plan)
+    details = _run_plan(
+        portia, events_plan, {"start_time": start_time, "end_time": end_time}
+    )
+    return details or []
+
+
+def _empty_report(details: Dict[str, Any]) -> dict:
+    """MeetingReport fields of a meeting, without any attendees."""
+    return {
+        "event_id": details.get("event_id"),
+        "meeting_title": details.get("meeting_title", ""),
+        "meeting_time": details.get("meeting_time", ""),
+        "organizer_email": details.get("organizer_email", ""),
+        "attendees": [],
+    }
+
+
+def _summarize_new_emails(
+    portia: Portia, details: Dict[str, Any], email_results: Dict[str, Any]
+) -> Dict[str, List[str]]:
+    """Summaries of the new messages only, keyed by lower-cased attendee email."""
+    summary_plan = get_plan(SUMMARY_PLAN_NAME, [], build_summary_plan)
+    output = _run_plan(portia, summary_plan, {"email_results": email_results})
+    if hasattr(output, "model_dump"):
+        output = output.model_dump()
+    elif isinstance(output, str):
+        try:
+            output = json.loads(re.sub(r"^```json\s*|\s*```$", "", output.strip()))
+        except json.JSONDecodeError:
+            pass
+    if isinstance(output, list):
+        output = {"attendees": output}
+    if not isinstance(output, dict):
+        raise ValueError(
+            f"Unexpected email summary for '{details.get('meeting_title')}': "
+            f"{str(output)[:200]}"
+        )
+    return {
+        attendee.get("email", "").lower(): attendee.get("email_summaries") or []
+        for attendee in output.get("attendees", [])
+        if isinstance(attendee, dict)
+    }
+
+
+def _summarize_meeting(
+    portia: Portia,
+    details: Dict[str, Any],
+    email_results: Dict[Tuple[str, str], Any],
+    searched_at: int,
+    pairs: Optional[List[Tuple[str, str]]] = None,
+) -> dict:
+    """Summarize new mail into the stored history and advance the pair cursors.
+
+    Only the new search results go to the LLM; their summaries are put in
+    front of the stored ones in code and the history is capped at
+    EMAIL_HISTORY_MAX_SUMMARIES. Without new mail no LLM call is made. A
+    pair's cursor only advances once its search succeeded and any new mail
+    was summarized. Only the attendees of `pairs` (default: all of the
+    meeting's) are summarized and included in the report.
+    """
+    report = _empty_report(details)
+    if pairs is None:
+        pairs = _meeting_pairs(details)
+    if not pairs:
+        return report
+    organizer = (details.get("organizer_email") or "").lower()
+    history = {pair: email_history.get(_history_key(pair)) or {} for pair in pairs}
+
+    new_results = {
+        attendee: email_results[(organizer, attendee)]
+        for _, attendee in pairs
+        if email_results.get((organizer, attendee))
+    }
+    new_summaries = (
+        _summarize_new_emails(portia, details, new_results) if new_results else {}
+    )
+
+    seen = set()
+    for attendee in filter_organizer(details):
+        pair = (organizer, attendee.get("email", "").lower())
+        if pair not in history or pair in seen:
+            continue
+        seen.add(pair)
+        summaries = new_summaries.get(pair[1], []) + history[pair].get(
+            "email_summaries", []
+        )
+        summaries = summaries[:EMAIL_HISTORY_MAX_SUMMARIES]
+        searched = email_results.get(pair) is not None
+        if searched and (pair[1] not in new_results or pair[1] in new_summaries):
+            email_history.set(
+                _history_key(pair),
+                {"email_summaries": summaries, "last_searched": searched_at},
+            )
+        report["attendees"].append(
+            {
+                "name": attendee.get("displayName") or "",
+                "email": attendee["email"],
+                "email_summaries": summaries,
+            }
+        )
+    return process_final_output(report)
+
+
+def get_meetings_and_emails(todaysDate: str) -> dict:
+    """Return the MeetingReport of the first meeting on the given day."""
+    portia = _get_portia()
+    meetings = _fetch_event_details(portia, todaysDate)
+    if not meetings:
+        raise ValueError(f"No calendar events found for {_day_window(todaysDate)[0]}.")
+    details = meetings[0]
+    searched_at = int(time.time())
+    email_results = search_attendee_emails(portia, _meeting_pairs(details))
+    return _summarize_meeting(portia, details, email_results, searched_at)
+
+
+def _shared_attendee(
+    pair: Tuple[str, str], summaries: Dict[Tuple[str, str], dict]
+) -> dict:
+    """The attendee summarized for `pair`, or its stored history if that failed."""
+    if pair in summaries:
+        return summaries[pair]
+    history = email_history.get(_history_key(pair)) or {}
+    return {
+        "name": derive_name_from_email(pair[1]),
+        "email": pair[1],
+        "email_summaries": history.get("email_summaries", []),
+    }
+
+
+def get_all_meetings_and_emails(
+    todaysDate: str, max_concurrency: int = MEETING_CONCURRENCY
+) -> List[dict]:
+    """Return a MeetingReport for every meeting on the given day.
+
+    Each organizer/attendee pair is searched in Gmail and summarized only once
+    even if the attendee is in several meetings: the first meeting with the
+    pair summarizes it and the others reuse that summary. Meetings are
+    summarized in parallel. A meeting whose summary fails is returned as a
+    record with an "error" key and no attendees. A day without events gives
+    an empty list.
+    """
+    portia = _get_portia()
+    meetings = _fetch_event_details(portia, todaysDate)
+    if not meetings:
+        return []
+    searched_at = int(time.time())
+    meeting_pairs = [_meeting_pairs(details) for details in meetings]
+    email_results = search_attendee_emails(
+        portia, [pair for pairs in meeting_pairs for pair in pairs]
+    )
+
+    # Each pair is owned by its first meeting, so its history has one writer
+    owners: Dict[Tuple[str, str], int] = {}
+    for index, pairs in enumerate(meeting_pairs):
+        for pair in pairs:
+            owners.setdefault(pair, index)
+    owned = [
+        [pair for pair in pairs if owners[pair] == index]
+        for index, pairs in enumerate(meeting_pairs)
+    ]
+
+    def summarize(index: int) -> dict:
+        return _summarize_meeting(
+            portia, meetings[index], email_results, searched_at, owned[index]
+        )
+
+    def on_error(index: int, error: Exception) -> dict:
+        details = meetings[index]
+        print(f"Failed to summarize meeting '{details.get('meeting_title')}': {error}")
+        return {**_empty_report(details), "error": str(error)}
+
+    reports = run_concurrently(
+        range(len(meetings)),
+        summarize,
+        max_concurrency=max_concurrency,
+        on_error=on_error,
+    )
+
+    summaries: Dict[Tuple[str, str], dict] = {}
+    for index, (details, report) in enumerate(zip(meetings, reports)):
+        organizer = (details.get("organizer_email") or "").lower()
+        for attendee in report.get("attendees", []):
+            pair = (organizer, attendee.get("email", "").lower())
+            if owners.get(pair) == index:
+                summaries[pair] = attendee
+    for report, pairs in zip(reports, meeting_pairs):
+        if not report.get("error"):
+            report["attendees"] = [_shared_attendee(pair, summaries) for pair in pairs]
+    return reports
+
+
 if __name__ == "__main__":
     today = datetime.date.today().isoformat()
     print("TODAYS DATE:", today)
@@ -12,15 +12,18 @@ Uses Apify's saswave/github-profile-scraper via MCP. Requires APIFY_TOKEN env va
 """
 
 import os
+import re
 import json
 import logging
-from typing import Dict, List, Any
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Any, Optional, Tuple
+from pydantic import BaseModel, Field
 from portia import (
     Config,
     DefaultToolRegistry,
     PlanRunState,
     Portia,
-    McpToolRegistry,
     LLMProvider,
     StorageClass,
     LogLevel,
@@ -28,73 +31,409 @@ from portia import (
 from portia.cli import CLIExecutionHooks
 from portia.builder.plan_builder_v2 import PlanBuilderV2
 from portia.builder.reference import Input, StepOutput
+from combinedTools.mcp_pool import (
+    APIFY_GITHUB,
+    call_with_fresh_registry,
+    get_mcp_registry,
+    parse_mcp_items,
+)
+from combinedTools.plan_cache import find_mcp_tool_id, get_plan
+from combinedTools.concurrency import run_concurrently
+from combinedTools.cache_store import SqliteCache
 from dotenv import load_dotenv
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 
+GITHUB_ANALYSIS_CONCURRENCY = int(os.getenv("GITHUB_ANALYSIS_CONCURRENCY", "4"))
+GITHUB_SCRAPE_TTL_SECONDS = float(os.getenv("GITHUB_SCRAPE_TTL_SECONDS", "86400"))
+GITHUB_ANALYSIS_TTL_SECONDS = float(os.getenv("GITHUB_ANALYSIS_TTL_SECONDS", "86400"))
+GITHUB_STALE_TTL_SECONDS = float(os.getenv("GITHUB_STALE_TTL_SECONDS", "604800"))
+GITHUB_CACHE_MAX_ENTRIES = int(os.getenv("GITHUB_CACHE_MAX_ENTRIES", "500"))
 
-def build_github_urls(username: str) -> List[str]:
-    """Construct GitHub profile URLs from username at runtime"""
-    return [f"https://github.com/{username}"]
+# Bump when the analysis output or ASSESS_PROFILE_TASK changes so cached
+# analyses are regenerated
+GITHUB_ANALYSIS_VERSION = "3"
 
+scrape_cache = SqliteCache(
+    "github_scrape",
+    ttl_seconds=GITHUB_SCRAPE_TTL_SECONDS,
+    max_entries=GITHUB_CACHE_MAX_ENTRIES,
+)
+analysis_cache = SqliteCache(
+    "github_analysis",
+    ttl_seconds=GITHUB_ANALYSIS_TTL_SECONDS,
+    max_entries=GITHUB_CACHE_MAX_ENTRIES,
+)
 
-def create_github_profile_plan():
-    """Create a Portia plan for analyzing GitHub profiles using Apify MCP"""
-    config = Config.from_default(
-        llm_provider=LLMProvider.OPENAI,
-        storage_class=StorageClass.CLOUD,
-        default_log_level=LogLevel.DEBUG,
+# Futures for analyses currently running, keyed by lower-cased username
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+# GitHub usernames: 1-39 alphanumerics or single hyphens, no leading/trailing hyphen
+GITHUB_USERNAME_RE = re.compile(r"^[A-Za-z0-9](?:[A-Za-z0-9]|-(?=[A-Za-z0-9])){0,38}$")
+
+# Top-level github.com paths that are GitHub pages, not accounts; GitHub
+# doesn't allow them as usernames
+GITHUB_RESERVED_PATHS = frozenset(
+    (
+        "about account apps blog business codespaces collections contact copilot "
+        "customer-stories dashboard discussions enterprise enterprises events "
+        "explore features gist gists github-copilot issues join login logout "
+        "marketplace new notifications organizations orgs pricing pulls readme "
+        "repositories search security sessions settings signup site sponsors "
+        "stars team teams topics trending users watching"
+    ).split()
+)
+
+
+def validate_github_username(username: str) -> str:
+    """Normalise a GitHub username or profile URL and check GitHub's username rules.
+
+    Accepts forms like "octocat", "@octocat" or "https://github.com/octocat/"
+    and returns the bare username. Raises ValueError for anything else.
+    """
+    value = str(username or "").strip()
+    match = re.match(
+        r"^(?:https?://)?(?:www\.)?github\.com/([^/?#]+)", value, re.IGNORECASE
     )
-    portia = Portia(
-        config=config,
-        tools=DefaultToolRegistry(config)
-        + McpToolRegistry.from_stdio_connection(
-            server_name="apify",
-            command="npx",
-            args=[
-                "-y",
-                "@apify/actors-mcp-server",
-                "--actors",
-                "saswave/github-profile-scraper",
-            ],
-            env={"APIFY_TOKEN": os.getenv("APIFY_TOKEN")},
-        ),
-        execution_hooks=CLIExecutionHooks(),
+    if match:
+        value = match.group(1)
+    value = value.strip("/").lstrip("@")
+    if value.lower() in GITHUB_RESERVED_PATHS or not GITHUB_USERNAME_RE.match(value):
+        raise ValueError(f"Invalid GitHub username: {username!r}")
+    return value
+
+
+def validate_github_usernames(usernames: List[str]) -> List[str]:
+    """Plan step: validate and normalise every username before scraping"""
+    return [validate_github_username(username) for username in usernames]
+
+
+def build_github_batch_urls(usernames: List[str]) -> List[str]:
+    """Construct GitHub profile URLs for every username in one scraper call"""
+    return [f"https://github.com/{username}" for username in usernames]
+
+
+def _profile_username(profile: Dict[str, Any]) -> str:
+    for key in ("username", "login"):
+        if profile.get(key):
+            return str(profile[key]).strip().lower()
+    for key in ("url", "profile_url", "link", "input"):
+        url = str(profile.get(key) or "")
+        if "github.com/" in url:
+            return url.rstrip("/").split("/")[-1].lower()
+    return ""
+
+
+def split_scraped_profiles(
+    scraped: Any, usernames: List[str]
+) -> Dict[str, Dict[str, Any]]:
+    """Map the batched scraper output back to each requested username"""
+    items = parse_mcp_items(scraped)
+    by_username = {_profile_username(item): item for item in items}
+    profiles = {}
+    for username in usernames:
+        profile = by_username.get(username.lower())
+        if profile is None and len(usernames) == 1 and len(items) == 1:
+            profile = items[0]
+        if profile is not None:
+            profiles[username] = profile
+    return profiles
+
+
+GITHUB_SCRAPE_PLAN_NAME = "Scrape GitHub Profiles"
+GITHUB_ANALYSIS_PLAN_NAME = "Analyze Scraped GitHub Profile"
+
+GITHUB_README_MAX_CHARS = int(os.getenv("GITHUB_README_MAX_CHARS", "6000"))
+
+# Canonical field -> the names the scraper output may use for it
+PROFILE_OVERVIEW_FIELDS = {
+    "name": ("name", "full_name", "fullName"),
+    "username": ("username", "login"),
+    "bio": ("bio", "description"),
+    "location": ("location",),
+    "organization": ("organization", "company", "organizations"),
+}
+PROFILE_COUNT_FIELDS = {
+    "followers": ("followers", "followers_count", "followersCount"),
+    "following": ("following", "following_count", "followingCount"),
+}
+PINNED_REPO_KEYS = (
+    "pinned_repositories",
+    "pinned_repos",
+    "pinnedRepositories",
+    "pinned",
+)
+REPO_FIELDS = {
+    "name": ("name", "title", "repo"),
+    "url": ("url", "link", "href"),
+    "description": ("description", "about"),
+}
+REPO_COUNT_FIELDS = {
+    "stars": ("stars", "stargazers", "stargazers_count", "stargazerCount"),
+    "forks": ("forks", "forks_count", "forkCount"),
+}
+ACHIEVEMENT_KEYS = ("achievements", "badges", "highlights")
+SOCIAL_LINK_KEYS = ("social_links", "socials", "social", "social_accounts")
+WEBSITE_KEYS = ("websites", "website", "blog")
+EMAIL_KEYS = ("emails", "email")
+README_KEYS = ("readme", "readme_content", "profile_readme", "README")
+
+# Social link label -> domains that identify it
+SOCIAL_DOMAINS = {
+    "twitter": ("twitter.com", "x.com"),
+    "linkedin": ("linkedin.com",),
+    "mastodon": ("mastodon.social", "fosstodon.org"),
+    "youtube": ("youtube.com",),
+}
+
+
+class GitHubProfileAssessment(BaseModel):
+    activity_summary: str = Field(
+        description="Summary of social presence, community engagement, project "
+        "diversity and recent activity"
+    )
+    skills_assessment: List[str] = Field(
+        description="Skills and technologies drawn from the README, bio and "
+        "repository descriptions"
     )
 
-    available_tools = [t.id for t in portia.tool_registry.get_tools()]
-    logging.info(f"Available tools: {available_tools}")
 
-    # Flexible search for tool ID (handles slash/underscore variations)
-    apify_tool_id = next(
-        (
-            tid
-            for tid in available_tools
-            if "saswave_slash_github_profile_scraper" in tid and "mcp:apify" in tid
+ASSESS_PROFILE_TASK = """Assess this GitHub profile from the extracted facts and the profile README.
+
+            activity_summary: A few sentences on their social presence, community engagement, project diversity and recent activity
+
+            skills_assessment: Skills and technologies drawn from the README, bio and repository descriptions, most prominent first
+
+            The facts (follower counts, stars, tech stack percentages) are already computed; use them as given and do not restate them as a list."""
+
+
+def _first(data: Dict[str, Any], names: Tuple[str, ...]) -> Any:
+    for name in names:
+        if data.get(name) not in (None, "", [], {}):
+            return data[name]
+    return None
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value in (None, "", [], {}):
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _count(value: Any) -> Optional[int]:
+    """Parse scraped counters such as 42, "1,204" or "1.2k"."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.match(r"^\s*([\d.,]+)\s*([kKmM]?)", str(value or ""))
+    if not match:
+        return None
+    try:
+        number = float(match.group(1).replace(",", ""))
+    except ValueError:
+        return None
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(match.group(2).lower(), 1)
+    return int(number * multiplier)
+
+
+def _name(item: Any) -> Optional[str]:
+    if isinstance(item, dict):
+        value = _first(item, ("name", "title", "alt", "label"))
+        return str(value) if value is not None else None
+    return str(item) if item not in (None, "") else None
+
+
+def _urls(value: Any) -> List[str]:
+    urls = []
+    for item in _as_list(value):
+        if isinstance(item, dict):
+            item = _first(item, ("url", "link", "href"))
+        if item:
+            urls.append(str(item))
+    return urls
+
+
+def repo_languages(repo: Dict[str, Any]) -> Dict[str, float]:
+    """Language weights of one repo: byte counts or shares when scraped, else 1 each"""
+    languages = _first(repo, ("languages", "language", "primary_language"))
+    if isinstance(languages, dict):
+        weights = {str(k): _count(v) for k, v in languages.items()}
+        return {k: float(v or 0) for k, v in weights.items()}
+    weights = {}
+    for language in _as_list(languages):
+        name = _name(language)
+        if name:
+            weights[name] = 1.0
+    return weights
+
+
+def _pinned_repository(repo: Any) -> Optional[Dict[str, Any]]:
+    if not isinstance(repo, dict):
+        return {"name": str(repo)} if repo else None
+    compacted = {}
+    for field, names in REPO_FIELDS.items():
+        value = _first(repo, names)
+        if value is not None:
+            compacted[field] = value
+    compacted["languages"] = list(repo_languages(repo))
+    for field, names in REPO_COUNT_FIELDS.items():
+        count = _count(_first(repo, names))
+        if count is not None:
+            compacted[field] = count
+    return compacted
+
+
+def compute_tech_stack(repos: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Share of each language across the pinned repos, in percent.
+
+    Every repo counts equally; within a repo the language weights are
+    normalised first, so a repo listing one language gives it the whole repo.
+    """
+    totals: Dict[str, float] = {}
+    for repo in repos:
+        weights = repo_languages(repo)
+        repo_total = sum(weights.values())
+        if not repo_total:
+            continue
+        for language, weight in weights.items():
+            totals[language] = totals.get(language, 0) + weight / repo_total
+    overall = sum(totals.values())
+    if not overall:
+        return {}
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    return {language: round(100 * share / overall, 1) for language, share in ranked}
+
+
+def extract_social_links(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Group profile links by network, with other links as websites"""
+    links: Dict[str, Any] = {}
+    websites = []
+    social = _first(profile, SOCIAL_LINK_KEYS)
+    if isinstance(social, dict):
+        candidates = [url for url in social.values() if isinstance(url, str)]
+    else:
+        candidates = _urls(social)
+    candidates += _urls(_first(profile, WEBSITE_KEYS))
+    for key in ("twitter", "x", "linkedin"):
+        if isinstance(profile.get(key), str):
+            candidates.append(profile[key])
+
+    for url in dict.fromkeys(candidates):
+        host = re.sub(r"^(?:https?://)?(?:www\.)?", "", url.lower()).split("/")[0]
+        label = next(
+            (
+                label
+                for label, domains in SOCIAL_DOMAINS.items()
+                if any(host == d or host.endswith("." + d) for d in domains)
+            ),
+            None,
+        )
+        if label and label not in links:
+            links[label] = url
+        elif not label:
+            websites.append(url)
+    if websites:
+        links["websites"] = websites
+    emails = [str(email) for email in _as_list(_first(profile, EMAIL_KEYS))]
+    if emails:
+        links["emails"] = emails
+    return links
+
+
+def profile_readme(profile: Dict[str, Any]) -> str:
+    """Plan step: the profile README, truncated for the assessment prompt"""
+    readme = _first(profile, README_KEYS) or ""
+    if not isinstance(readme, str):
+        readme = json.dumps(readme, ensure_ascii=False, default=str)
+    return readme[:GITHUB_README_MAX_CHARS]
+
+
+def extract_github_facts(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Plan step: every analysis field that can be read off the scraped profile.
+
+    Produces profile_overview, pinned_repositories, achievements, tech_stack
+    and social_links without an LLM call.
+    """
+    overview: Dict[str, Any] = {}
+    for field, names in PROFILE_OVERVIEW_FIELDS.items():
+        value = _first(profile, names)
+        if value is not None:
+            overview[field] = value
+    if "username" not in overview and _profile_username(profile):
+        overview["username"] = _profile_username(profile)
+    for field, names in PROFILE_COUNT_FIELDS.items():
+        count = _count(_first(profile, names))
+        if count is not None:
+            overview[field] = count
+    social_links = extract_social_links(profile)
+    for field in ("websites", "emails"):
+        if field in social_links:
+            overview[field] = social_links[field]
+
+    raw_repos = [repo for repo in _as_list(_first(profile, PINNED_REPO_KEYS)) if repo]
+    repos = [_pinned_repository(repo) for repo in raw_repos]
+    achievements = [
+        name
+        for key in ACHIEVEMENT_KEYS
+        for name in map(_name, _as_list(profile.get(key)))
+        if name
+    ]
+    return {
+        "profile_overview": overview,
+        "pinned_repositories": [repo for repo in repos if repo],
+        "achievements": list(dict.fromkeys(achievements)),
+        "tech_stack": compute_tech_stack(
+            [repo for repo in raw_repos if isinstance(repo, dict)]
         ),
-        None,
+        "social_links": social_links,
+    }
+
+
+def merge_github_analysis(facts: Dict[str, Any], assessment: Any) -> Dict[str, Any]:
+    """Plan step: combine the extracted facts with the LLM assessment"""
+    if hasattr(assessment, "model_dump"):
+        assessment = assessment.model_dump()
+    if isinstance(assessment, str):
+        assessment = GitHubProfileAssessment.model_validate_json(assessment)
+        assessment = assessment.model_dump()
+    return {**facts, **assessment}
+
+
+def find_github_scraper_tool_id() -> str:
+    """Resolve the Apify GitHub scraper tool ID from the pooled MCP registry"""
+    # Flexible search for tool ID (handles slash/underscore variations)
+    apify_tool_id = find_mcp_tool_id(
+        APIFY_GITHUB,
+        "github_scraper",
+        lambda tid: "saswave_slash_github_profile_scraper" in tid
+        and "mcp:apify" in tid,
     )
     if not apify_tool_id:
         raise ValueError(
             "GitHub profile scraper not found in registry. Check actor ID format and Apify trial status."
         )
     logging.info(f"Found Apify tool with ID: {apify_tool_id}")
+    return apify_tool_id
+
 
-    plan = (
-        PlanBuilderV2("Analyze GitHub Profile")
+def create_github_scrape_plan(apify_tool_id: str):
+    """Create a Portia plan that scrapes many GitHub profiles in one actor run"""
+    return (
+        PlanBuilderV2(GITHUB_SCRAPE_PLAN_NAME)
         .input(
-            name="github_username",
-            description="GitHub username to analyze",
+            name="github_usernames",
+            description="GitHub usernames to scrape",
         )
-        .llm_step(
-            task="Validate the GitHub username and ensure it's in the correct format (alphanumeric with hyphens/underscores). If valid, output ONLY the username as a single string with no additional text. If invalid, output 'INVALID' and clarify why.",
-            inputs=[Input("github_username")],
-            step_name="Validate Username",
+        .function_step(
+            function=validate_github_usernames,
+            args={"usernames": Input("github_usernames")},
+            step_name="Validate Usernames",
         )
         .function_step(
-            function=build_github_urls,
-            args={"username": StepOutput("Validate Username")},
+            function=build_github_batch_urls,
+            args={"usernames": StepOutput("Validate Usernames")},
             step_name="Build GitHub URLs",
         )
         .invoke_tool_step(
@@ -102,77 +441,77 @@ def create_github_profile_plan():
             args={
                 "peoples_links": StepOutput("Build GitHub URLs"),
             },
-            step_name="Scrape GitHub Profile",
+            step_name="Scrape GitHub Profiles",
         )
-        .llm_step(
-            task="""Analyze the scraped GitHub profile data and create a comprehensive summary based on the actual data structure:
-
-            The data contains:
-            - Basic profile info: name, username, followers, following, bio, location, emails, organization, websites
-            - Achievements: GitHub badges and achievements
-            - Social links: X (Twitter), LinkedIn
-            - Highlights: GitHub Pro status, etc.
-            - Pinned repositories: name, url, description, languages, stars, forks
-            - README content: detailed profile information and skills
-
-            Create a structured analysis in JSON format with these keys:
-
-            "profile_overview": Extract name, username, bio, location, followers/following, organization, websites, emails
-
-            "pinned_repositories": List repository names, descriptions, URLs, languages, stars, forks, project types
-
-            "achievements": List GitHub badges, achievements, Pro status, highlights
-
-            "tech_stack": Dictionary of languages/technologies with estimated usage percentages from pinned repos and README
-
-            "skills_assessment": List of extracted skills from README, bio, repo descriptions
+        .function_step(
+            function=split_scraped_profiles,
+            args={
+                "scraped": StepOutput("Scrape GitHub Profiles"),
+                "usernames": StepOutput("Validate Usernames"),
+            },
+            step_name="Split Profiles By Username",
+        )
+        .final_output()
+        .build()
+    )
 
-            "activity_summary": Summary of social presence, community engagement, project diversity, recent activity
 
-            "social_links": Dictionary of Twitter/X, LinkedIn, personal website, email contacts
+def create_github_analysis_plan():
+    """Create a Portia plan that analyzes one already-scraped GitHub profile
 
-            Output ONLY the JSON object with no additional text.""",
-            inputs=[StepOutput("Scrape GitHub Profile")],
-            step_name="Analyze Data",
+    Counts, percentages and links are extracted in code; the LLM only writes
+    the activity summary and skills assessment.
+    """
+    return (
+        PlanBuilderV2(GITHUB_ANALYSIS_PLAN_NAME)
+        .input(
+            name="profile_data",
+            description="Scraped GitHub profile data for a single user",
+        )
+        .function_step(
+            function=extract_github_facts,
+            args={"profile": Input("profile_data")},
+            step_name="Extract Profile Facts",
+        )
+        .function_step(
+            function=profile_readme,
+            args={"profile": Input("profile_data")},
+            step_name="Extract README",
+        )
+        .llm_step(
+            task=ASSESS_PROFILE_TASK,
+            inputs=[StepOutput("Extract Profile Facts"), StepOutput("Extract README")],
+            output_schema=GitHubProfileAssessment,
+            step_name="Assess Profile",
+        )
+        .function_step(
+            function=merge_github_analysis,
+            args={
+                "facts": StepOutput("Extract Profile Facts"),
+                "assessment": StepOutput("Assess Profile"),
+            },
+            step_name="Merge Analysis",
         )
         .final_output()
         .build()
     )
 
-    return plan
 
-
-def analyze_github_profile(username: str) -> Dict[str, Any]:
-    """Run the plan to analyze a GitHub profile using Apify scraper"""
+def _get_portia() -> Portia:
     config = Config.from_default(
         llm_provider=LLMProvider.OPENAI,
         storage_class=StorageClass.CLOUD,
         default_log_level=LogLevel.DEBUG,
     )
-
-    portia = Portia(
+    return Portia(
         config=config,
-        tools=DefaultToolRegistry(config)
-        + McpToolRegistry.from_stdio_connection(
-            server_name="apify",
-            command="npx",
-            args=[
-                "-y",
-                "@apify/actors-mcp-server",
-                "--actors",
-                "saswave/github-profile-scraper",
-            ],
-            env={"APIFY_TOKEN": os.getenv("APIFY_TOKEN")},
-        ),
+        tools=DefaultToolRegistry(config) + get_mcp_registry(APIFY_GITHUB),
         execution_hooks=CLIExecutionHooks(),
     )
 
-    plan = create_github_profile_plan()
 
-    plan_run = portia.run_plan(
-        plan,
-        plan_run_inputs={"github_username": username},
-    )
+def _run_to_completion(portia: Portia, plan, plan_run_inputs: Dict[str, Any]):
+    plan_run = portia.run_plan(plan, plan_run_inputs=plan_run_inputs)
 
     while plan_run.state == PlanRunState.NEED_CLARIFICATION:
         for clarification in plan_run.get_outstanding_clarifications():
@@ -184,15 +523,231 @@ def analyze_github_profile(username: str) -> Dict[str, Any]:
         plan_run = portia.resume(plan_run)
 
     if plan_run.state == PlanRunState.COMPLETE and plan_run.outputs.final_output:
-        final_output = plan_run.outputs.final_output.value
-        # Since no model, assume LLM outputs JSON string - parse it
-        try:
-            return json.loads(final_output)
-        except json.JSONDecodeError:
-            return {"result": str(final_output), "error": "Failed to parse JSON"}
+        return plan_run.outputs.final_output.value
+    return None
+
+
+def _parse_analysis(final_output: Any) -> Dict[str, Any]:
+    if hasattr(final_output, "model_dump"):
+        return final_output.model_dump()
+    if isinstance(final_output, dict):
+        return final_output
+    return {"result": str(final_output), "error": "Unexpected analysis output"}
+
+
+def scrape_github_profiles(usernames: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Scrape all usernames with a single Apify actor run, keyed by username
+
+    A run that loses its MCP connection is retried once against a freshly
+    listed registry; a FAILED plan run is not retried.
+    """
+
+    def scrape() -> Dict[str, Dict[str, Any]]:
+        portia = _get_portia()
+        apify_tool_id = find_github_scraper_tool_id()
+        plan = get_plan(
+            GITHUB_SCRAPE_PLAN_NAME,
+            [apify_tool_id],
+            lambda: create_github_scrape_plan(apify_tool_id),
+        )
+        final_output = _run_to_completion(
+            portia, plan, {"github_usernames": usernames}
+        )
+        if final_output is None:
+            raise Exception("GitHub scrape failed")
+        return final_output
+
+    return call_with_fresh_registry(APIFY_GITHUB, scrape)
+
+
+def analyze_scraped_github_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the analysis step on a profile returned by scrape_github_profiles"""
+    portia = _get_portia()
+    plan = get_plan(GITHUB_ANALYSIS_PLAN_NAME, [], create_github_analysis_plan)
+
+    final_output = _run_to_completion(portia, plan, {"profile_data": profile})
+    if final_output is not None:
+        return _parse_analysis(final_output)
     raise Exception("Analysis failed")
 
 
+def _cache_key(username: str) -> str:
+    return username.strip().lower()
+
+
+def _analysis_key(username: str) -> str:
+    return f"{GITHUB_ANALYSIS_VERSION}:{_cache_key(username)}"
+
+
+def _scrape_and_analyze(usernames: List[str], max_concurrency: int) -> Dict[str, Any]:
+    """Analyze usernames without consulting the analysis cache.
+
+    Returns a mapping of username to its analysis, or to the exception that
+    prevented it. Raw scrapes still come from the scrape cache when fresh.
+    """
+    results: Dict[str, Any] = {}
+    profiles: Dict[str, Dict[str, Any]] = {}
+    to_scrape = []
+    for username in usernames:
+        cached = scrape_cache.get(_cache_key(username))
+        if cached is not None:
+            profiles[username] = cached
+        else:
+            to_scrape.append(username)
+
+    if to_scrape:
+        print(f"\n--- Scraping GitHub Profiles: {', '.join(to_scrape)} ---")
+        try:
+            for username, profile in scrape_github_profiles(to_scrape).items():
+                scrape_cache.set(_cache_key(username), profile)
+                profiles[username] = profile
+        except Exception as e:
+            for username in to_scrape:
+                results[username] = e
+
+    def analyze(username: str) -> Dict[str, Any]:
+        if username not in profiles:
+            raise ValueError("no profile returned by the scraper")
+        print(f"\n--- Analyzing GitHub Profile: {username} ---")
+        analysis = analyze_scraped_github_profile(profiles[username])
+        if "error" not in analysis:
+            analysis_cache.set(_analysis_key(username), analysis)
+        print(f"Successfully analyzed GitHub profile: {username}")
+        return analysis
+
+    pending = [username for username in usernames if username not in results]
+    analyses = run_concurrently(
+        pending,
+        analyze,
+        max_concurrency=max_concurrency,
+        on_error=lambda username, e: e,
+    )
+    results.update(zip(pending, analyses))
+    return results
+
+
+def _refresh_analyses(usernames: List[str], max_concurrency: int) -> Dict[str, Any]:
+    """Run `_scrape_and_analyze`, sharing one run per username across callers."""
+    owned = []
+    waiting: Dict[str, Future] = {}
+    with _inflight_lock:
+        for username in usernames:
+            key = _cache_key(username)
+            if key in _inflight:
+                waiting[username] = _inflight[key]
+            else:
+                _inflight[key] = Future()
+                owned.append(username)
+
+    results: Dict[str, Any] = {}
+    try:
+        if owned:
+            results.update(_scrape_and_analyze(owned, max_concurrency))
+    finally:
+        with _inflight_lock:
+            for username in owned:
+                future = _inflight.pop(_cache_key(username))
+                outcome = results.get(
+                    username, RuntimeError("GitHub analysis did not complete")
+                )
+                if isinstance(outcome, Exception):
+                    future.set_exception(outcome)
+                else:
+                    future.set_result(outcome)
+
+    for username, future in waiting.items():
+        try:
+            results[username] = future.result()
+        except Exception as e:
+            results[username] = e
+    return results
+
+
+def _get_analyses(usernames: List[str], max_concurrency: int) -> Dict[str, Any]:
+    """Serve analyses from cache, revalidating stale ones in the background."""
+    results: Dict[str, Any] = {}
+    missing = []
+    stale = []
+    for username in usernames:
+        entry = analysis_cache.get_entry(_analysis_key(username))
+        if entry is not None and analysis_cache.is_fresh(entry):
+            results[username] = entry.value
+        elif entry is not None and entry.age < GITHUB_STALE_TTL_SECONDS:
+            results[username] = entry.value
+            stale.append(username)
+        else:
+            missing.append(username)
+
+    if stale:
+        logging.info(f"Serving stale GitHub analyses, revalidating: {stale}")
+        threading.Thread(
+            target=_refresh_analyses, args=(stale, max_concurrency), daemon=True
+        ).start()
+    if missing:
+        results.update(_refresh_analyses(missing, max_concurrency))
+    return results
+
+
+def analyze_github_profile(username: str) -> Dict[str, Any]:
+    """Analyze a single GitHub profile, using the analysis cache when possible"""
+    username = validate_github_username(username)
+    outcome = _get_analyses([username], GITHUB_ANALYSIS_CONCURRENCY).get(username)
+    if isinstance(outcome, Exception):
+        raise Exception("Analysis failed") from outcome
+    if outcome is None:
+        raise Exception("Analysis failed")
+    return outcome
+
+
+def valid_github_usernames(usernames: List[str]) -> List[str]:
+    """Validated, de-duplicated usernames; invalid ones are logged and skipped."""
+    valid = []
+    for username in usernames:
+        try:
+            valid.append(validate_github_username(username))
+        except ValueError as e:
+            print(f"Skipping GitHub profile: {e}")
+    return list(dict.fromkeys(valid))
+
+
+def analyze_github_profiles_by_username(
+    usernames: List[str], max_concurrency: int = GITHUB_ANALYSIS_CONCURRENCY
+) -> Dict[str, Dict[str, Any]]:
+    """Like analyze_github_profiles, but keyed by validated username.
+
+    Lets callers analyze everyone once and map the results back to the
+    groups of usernames they came from. Failed profiles are left out.
+    """
+    usernames = valid_github_usernames(usernames)
+    results = _get_analyses(usernames, max_concurrency)
+
+    analyses = {}
+    for username in usernames:
+        outcome = results.get(username)
+        if outcome is None or isinstance(outcome, Exception):
+            print(f"Failed to analyze profile {username}: {outcome}")
+        else:
+            analyses[username] = outcome
+    return analyses
+
+
+def analyze_github_profiles(
+    usernames: List[str], max_concurrency: int = GITHUB_ANALYSIS_CONCURRENCY
+) -> List[Dict[str, Any]]:
+    """Analyze several GitHub profiles in parallel.
+
+    `usernames` may also be profile URLs; invalid names are skipped before any
+    scraper or LLM call.
+    Cached analyses are returned directly (stale ones are refreshed in the
+    background). The remaining profiles are scraped in one actor run and
+    analyzed concurrently, with concurrent requests for the same user sharing
+    one run. Returns the successful analyses in input order; profiles that
+    fail are logged and skipped.
+    """
+    analyses = analyze_github_profiles_by_username(usernames, max_concurrency)
+    return list(analyses.values())
+
+
 if __name__ == "__main__":
     username = input("Enter GitHub username: ")
     try:
@@ -1,148 +1,275 @@
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
+from typing import List, Optional
+import datetime
 import os
-import re
+import threading
+from difflib import SequenceMatcher
+from combinedTools.cache_store import SqliteCache
+from combinedTools.markdown_to_docs import build_document_requests, split_sections
 
-def create_google_docs_summary(markdown: str):
+DOCS_BATCH_SIZE = int(os.getenv("DOCS_BATCH_SIZE", "500"))
+
+SCOPES = ["https://www.googleapis.com/auth/documents"]
+TOKEN_PATH = os.getenv("GOOGLE_TOKEN_PATH", "token.json")
+CLIENT_SECRETS_PATH = os.getenv("GOOGLE_CLIENT_SECRETS_PATH", "credentials.json")
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv("TOKEN_REFRESH_MARGIN_SECONDS", "300"))
+# The browser consent flow blocks until someone completes it, so the server
+# never starts it by default; authorize once by running this module instead
+INTERACTIVE_AUTH = os.getenv("GOOGLE_INTERACTIVE_AUTH", "false").lower() == "true"
+
+# Document ID and last written markdown per calendar event ID
+event_docs = SqliteCache("event_docs")
+
+
+def batch_update(
+    service, document_id: str, requests: List[dict], batch_size: int = DOCS_BATCH_SIZE
+):
+    """Send the requests in order, at most `batch_size` per batchUpdate call."""
+    for start in range(0, len(requests), batch_size):
+        service.documents().batchUpdate(
+            documentId=document_id,
+            body={"requests": requests[start : start + batch_size]},
+        ).execute()
+
+
+class GoogleCredentialsManager:
+    """
+    Process-wide Google credentials and Docs service.
+
+    Credentials are read from disk once, kept in memory and refreshed shortly
+    before they expire. The Docs service is built from the bundled discovery
+    document and cached per thread, as the underlying httplib2 client is not
+    thread-safe.
+    """
+
+    def __init__(
+        self,
+        scopes: List[str] = SCOPES,
+        token_path: str = TOKEN_PATH,
+        client_secrets_path: str = CLIENT_SECRETS_PATH,
+        refresh_margin_seconds: int = TOKEN_REFRESH_MARGIN_SECONDS,
+        interactive: bool = INTERACTIVE_AUTH,
+    ):
+        self.scopes = scopes
+        self.token_path = token_path
+        self.client_secrets_path = client_secrets_path
+        self.refresh_margin = datetime.timedelta(seconds=refresh_margin_seconds)
+        self.interactive = interactive
+        self._creds: Optional[Credentials] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _save(self) -> None:
+        with open(self.token_path, "w") as token:
+            token.write(self._creds.to_json())
+
+    def _expires_soon(self) -> bool:
+        if not self._creds.valid:
+            return True
+        # google-auth keeps expiry as a naive UTC datetime
+        expiry = self._creds.expiry
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return expiry is not None and expiry - now < self.refresh_margin
+
+    def authorize_interactively(self) -> Credentials:
+        """Run the browser consent flow and store the resulting token."""
+        flow = InstalledAppFlow.from_client_secrets_file(
+            self.client_secrets_path, self.scopes
+        )
+        with self._lock:
+            self._creds = flow.run_local_server(port=0)
+            self._save()
+            return self._creds
+
+    def credentials(self) -> Credentials:
+        """Return valid credentials, refreshing them ahead of expiry."""
+        with self._lock:
+            if self._creds is None and os.path.exists(self.token_path):
+                self._creds = Credentials.from_authorized_user_file(
+                    self.token_path, self.scopes
+                )
+
+            if self._creds is not None and self._expires_soon():
+                if self._creds.refresh_token:
+                    try:
+                        self._creds.refresh(Request())
+                        self._save()
+                    except RefreshError as e:
+                        print(f"Google token refresh failed: {e}")
+
+            if self._creds is not None and self._creds.valid:
+                return self._creds
+
+        if self.interactive:
+            return self.authorize_interactively()
+        raise RuntimeError(
+            f"Google credentials in {self.token_path} are missing or revoked; "
+            "run `python -m combinedTools.google_docs_creation` to authorize"
+        )
+
+    def docs_service(self):
+        """Docs API client for the calling thread, rebuilt only after re-auth."""
+        creds = self.credentials()
+        if getattr(self._local, "creds", None) is not creds:
+            self._local.service = build(
+                "docs",
+                "v1",
+                credentials=creds,
+                static_discovery=True,
+                cache_discovery=False,
+            )
+            self._local.creds = creds
+        return self._local.service
+
+
+google_credentials = GoogleCredentialsManager()
+
+
+def document_url(document_id: str) -> str:
+    return f"https://docs.google.com/document/d/{document_id}"
+
+
+def _section_bounds(service, document_id: str) -> List[int]:
+    """
+    Start index of the document, of every non-empty HEADING_1/HEADING_2
+    paragraph, and the end of the editable body
+    """
+    doc = (
+        service.documents()
+        .get(
+            documentId=document_id,
+            fields="body(content(startIndex,endIndex,"
+            "paragraph(paragraphStyle(namedStyleType))))",
+        )
+        .execute()
+    )
+    content = doc["body"]["content"]
+    bounds = [1]
+    for element in content:
+        paragraph = element.get("paragraph")
+        if not paragraph:
+            continue
+        style = paragraph.get("paragraphStyle", {}).get("namedStyleType")
+        # An empty paragraph is only its newline and has no markdown heading
+        empty = element["endIndex"] - element["startIndex"] <= 1
+        if style in ("HEADING_1", "HEADING_2") and not empty:
+            bounds.append(element["startIndex"])
+    # The body's final newline cannot be deleted
+    bounds.append(content[-1]["endIndex"] - 1)
+    return bounds
+
+
+def build_update_requests(
+    old_markdown: str, new_markdown: str, bounds: List[int]
+) -> List[dict]:
+    """
+    Requests that turn a document written from `old_markdown` into one for
+    `new_markdown`, rewriting only the sections that changed. Changes are
+    applied from the end of the document backwards so the section bounds
+    read from the document stay valid.
+    """
+    old_sections = split_sections(old_markdown)
+    new_sections = split_sections(new_markdown)
+    if len(bounds) != len(old_sections) + 1:
+        # The document was edited by hand; rewrite all of it
+        old_sections = [old_markdown]
+        bounds = [bounds[0], bounds[-1]]
+
+    matcher = SequenceMatcher(None, old_sections, new_sections, autojunk=False)
+    requests = []
+    for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+        if tag == "equal":
+            continue
+        start, end = bounds[i1], bounds[i2]
+        if end > start:
+            deleted = {"startIndex": start, "endIndex": end}
+            requests.append({"deleteContentRange": {"range": deleted}})
+        if j2 > j1:
+            requests += build_document_requests(
+                "\n".join(new_sections[j1:j2]),
+                start_index=start,
+                trailing_blank=j2 < len(new_sections),
+                reset_styles=True,
+            )
+    return requests
+
+
+def build_rewrite_requests(markdown: str, bounds: List[int]) -> List[dict]:
+    """Requests that replace the whole body of a document with `markdown`."""
+    start, end = bounds[0], bounds[-1]
+    requests = []
+    if end > start:
+        deleted = {"startIndex": start, "endIndex": end}
+        requests.append({"deleteContentRange": {"range": deleted}})
+    requests += build_document_requests(markdown, start_index=start, reset_styles=True)
+    return requests
+
+
+def update_google_doc(service, document_id: str, old_markdown: str, markdown: str):
+    """
+    Rewrite only the changed sections of an existing prep document. If the
+    incremental update fails part way, the whole document is rewritten in
+    place so it keeps its ID; errors from that rewrite are raised.
+    """
+    try:
+        bounds = _section_bounds(service, document_id)
+        requests = build_update_requests(old_markdown, markdown, bounds)
+        if requests:
+            batch_update(service, document_id, requests)
+    except Exception as e:
+        print(f"Incremental update of {document_id} failed, rewriting it: {e}")
+        bounds = _section_bounds(service, document_id)
+        requests = build_rewrite_requests(markdown, bounds)
+        batch_update(service, document_id, requests)
+    print(f"Updated {document_id} with {len(requests)} requests")
+
+
+def create_google_docs_summary(markdown: str, event_id: Optional[str] = None):
     """
     Create a meeting summary in Google Docs with proper formatting
+
+    With an event_id the document written for that calendar event is reused:
+    only sections that differ from the previously written markdown are
+    rewritten, and the URL stays the same. A new document is only created if
+    the previous one no longer exists.
     """
-    
-    SCOPES = ["https://www.googleapis.com/auth/documents"]
-    
-    creds = None
-    if os.path.exists("token.json"):
-        creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-    
-    if not creds or not creds.valid:
-        flow = InstalledAppFlow.from_client_secrets_file("credentials.json", SCOPES)
-        creds = flow.run_local_server(port=0)
-        with open("token.json", "w") as token:
-            token.write(creds.to_json())
-    
-    service = build("docs", "v1", credentials=creds)
-    
+
+    service = google_credentials.docs_service()
+
+    previous = event_docs.get(event_id) if event_id else None
+    if previous:
+        try:
+            update_google_doc(
+                service, previous["document_id"], previous["markdown"], markdown
+            )
+        except HttpError as e:
+            if e.resp.status != 404:
+                raise
+            print(f"The doc for event {event_id} was deleted, creating a new one")
+        else:
+            event_docs.set(
+                event_id, {"document_id": previous["document_id"], "markdown": markdown}
+            )
+            return document_url(previous["document_id"])
+
     document = {"title": "PORTIA TESTING Meet - Meeting Preparation"}
     doc = service.documents().create(body=document).execute()
     document_id = doc.get("documentId")
-    
-    requests = []
-    current_index = 1
-    
-    lines = markdown.split('\n')
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        if line.startswith('# '):
-            requests.append({
-                "insertText": {
-                    "location": {"index": current_index},
-                    "text": line[2:] + "\n"
-                }
-            })
-            requests.append({
-                "updateParagraphStyle": {
-                    "range": {
-                        "startIndex": current_index,
-                        "endIndex": current_index + len(line[2:])
-                    },
-                    "paragraphStyle": {
-                        "namedStyleType": "HEADING_1"
-                    },
-                    "fields": "namedStyleType"
-                }
-            })
-            current_index += len(line[2:]) + 1
-            
-        elif line.startswith('## '):
-            requests.append({
-                "insertText": {
-                    "location": {"index": current_index},
-                    "text": line[3:] + "\n"
-                }
-            })
-            requests.append({
-                "updateParagraphStyle": {
-                    "range": {
-                        "startIndex": current_index,
-                        "endIndex": current_index + len(line[3:])
-                    },
-                    "paragraphStyle": {
-                        "namedStyleType": "HEADING_2"
-                    },
-                    "fields": "namedStyleType"
-                }
-            })
-            current_index += len(line[3:]) + 1
-            
-        elif line.startswith('### '):
-            requests.append({
-                "insertText": {
-                    "location": {"index": current_index},
-                    "text": line[4:] + "\n"
-                }
-            })
-            requests.append({
-                "updateParagraphStyle": {
-                    "range": {
-                        "startIndex": current_index,
-                        "endIndex": current_index + len(line[4:])
-                    },
-                    "paragraphStyle": {
-                        "namedStyleType": "HEADING_3"
-                    },
-                    "fields": "namedStyleType"
-                }
-            })
-            current_index += len(line[4:]) + 1
-            
-        elif line.startswith('- '):
-            requests.append({
-                "insertText": {
-                    "location": {"index": current_index},
-                    "text": line[2:] + "\n"
-                }
-            })
-            requests.append({
-                "createParagraphBullets": {
-                    "range": {
-                        "startIndex": current_index,
-                        "endIndex": current_index + len(line[2:])
-                    },
-                    "bulletPreset": "BULLET_DISC_CIRCLE_SQUARE"
-                }
-            })
-            current_index += len(line[2:]) + 1
-            
-        elif line.startswith('|'):
-            requests.append({
-                "insertText": {
-                    "location": {"index": current_index},
-                    "text": line + "\n"
-                }
-            })
-            current_index += len(line) + 1
-            
-        else:
-            requests.append({
-                "insertText": {
-                    "location": {"index": current_index},
-                    "text": line + "\n"
-                }
-            })
-            current_index += len(line) + 1
-    
+
+    requests = build_document_requests(markdown)
     if requests:
-        service.documents().batchUpdate(
-            documentId=document_id, 
-            body={"requests": requests}
-        ).execute()
-    
-    return f"https://docs.google.com/document/d/{document_id}"
+        batch_update(service, document_id, requests)
+
+    if event_id:
+        event_docs.set(event_id, {"document_id": document_id, "markdown": markdown})
+    return document_url(document_id)
 
 
-# print(create_google_docs_summary(markdown_summary))
+if __name__ == "__main__":
+    google_credentials.authorize_interactively()
+    print(f"Google credentials saved to {google_credentials.token_path}")
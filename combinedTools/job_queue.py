@@ -0,0 +1,288 @@
+"""
+SQLite-backed background job queue.
+
+Jobs are persisted with their parameters, status and per-stage results, so a
+client can poll them and they survive a restart. A `JobWorkerPool` of
+`JOB_WORKERS` threads claims queued jobs and runs them through a handler.
+
+Several server processes can share the database. A job is claimed atomically
+and records which queue owns it; the owner refreshes its heartbeat while the
+job runs, and only running jobs whose heartbeat is older than
+`JOB_STALE_SECONDS` (their process died) are put back on the queue.
+
+Like the cache, the database lives in the project root (or at
+PREPPILOT_JOBS_DB, relative paths resolved against the project root) and is
+opened on first use, not when the queue is created.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+from combinedTools.cache_store import PROJECT_ROOT
+
+load_dotenv()
+
+JOBS_DB_PATH = os.path.join(
+    PROJECT_ROOT, os.getenv("PREPPILOT_JOBS_DB", ".preppilot_jobs.sqlite3")
+)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "120"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def _encode(value: Any) -> Any:
+    """json.dumps fallback that serializes pydantic models in stage results."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
+
+
+class JobQueue:
+    """Persistent FIFO of jobs with status and per-stage results."""
+
+    def __init__(self, path: str = JOBS_DB_PATH):
+        self.path = path
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._initialized = False
+
+    def _create_table(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                stages TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                owner TEXT,
+                heartbeat_at REAL
+            )
+            """
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._initialized = True
+
+    @contextmanager
+    def _connect(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+        """Connection in a transaction; `immediate` takes the write lock up front.
+
+        Call with `_lock` held.
+        """
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            if not self._initialized:
+                with conn:
+                    self._create_table(conn)
+            with conn:
+                if immediate:
+                    conn.execute("BEGIN IMMEDIATE")
+                yield conn
+        finally:
+            conn.close()
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        """Update a job this queue still owns."""
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET {columns} WHERE id = ? AND owner = ?",
+                (*fields.values(), job_id, self.owner),
+            )
+
+    def enqueue(self, kind: str, params: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._available, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, params, status, stages, created_at, "
+                "updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(params), QUEUED, "[]", now, now),
+            )
+            self._available.notify()
+        return job_id
+
+    def heartbeat(self) -> None:
+        """Mark every job this queue is running as still alive."""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE status = ? AND owner = ?",
+                (time.time(), RUNNING, self.owner),
+            )
+
+    def requeue_stale(self, stale_after: float = JOB_STALE_SECONDS) -> int:
+        """Put running jobs whose owner stopped sending heartbeats back on the queue."""
+        now = time.time()
+        with self._available, self._connect() as conn:
+            count = conn.execute(
+                "UPDATE jobs SET status = ?, stages = '[]', owner = NULL, "
+                "heartbeat_at = NULL, updated_at = ? WHERE status = ? "
+                "AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                (QUEUED, now, RUNNING, now - stale_after),
+            ).rowcount
+            if count:
+                self._available.notify_all()
+        return count
+
+    def claim(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Mark the oldest queued job as running and return it.
+
+        Waits up to `timeout` seconds for a job to be enqueued.
+        """
+        with self._available:
+            while True:
+                # The write lock keeps other processes from claiming the same job
+                with self._connect(immediate=True) as conn:
+                    row = conn.execute(
+                        "SELECT id, kind, params FROM jobs WHERE status = ? "
+                        "ORDER BY created_at LIMIT 1",
+                        (QUEUED,),
+                    ).fetchone()
+                    if row is not None:
+                        now = time.time()
+                        conn.execute(
+                            "UPDATE jobs SET status = ?, owner = ?, heartbeat_at = ?, "
+                            "updated_at = ? WHERE id = ?",
+                            (RUNNING, self.owner, now, now, row[0]),
+                        )
+                        return {
+                            "id": row[0],
+                            "kind": row[1],
+                            "params": json.loads(row[2]),
+                        }
+                if not self._available.wait(timeout):
+                    return None
+
+    def record_stage(self, job_id: str, stage: str, result: Any) -> None:
+        job = self.get(job_id)
+        stages = job["stages"] + [{"stage": stage, "result": result}]
+        self._update(job_id, stages=json.dumps(stages, default=_encode))
+
+    def complete(self, job_id: str, result: Any) -> None:
+        result = json.dumps(result, default=_encode)
+        self._update(job_id, status=SUCCEEDED, result=result)
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._update(job_id, status=FAILED, error=error)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, kind, params, status, stages, result, error, "
+                "created_at, updated_at, owner, heartbeat_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "params": json.loads(row[2]),
+            "status": row[3],
+            "stages": json.loads(row[4]),
+            "result": json.loads(row[5]) if row[5] is not None else None,
+            "error": row[6],
+            "created_at": row[7],
+            "updated_at": row[8],
+            "owner": row[9],
+            "heartbeat_at": row[10],
+        }
+
+
+JobHandler = Callable[[JobQueue, Dict[str, Any]], Any]
+
+
+class JobWorkerPool:
+    """Daemon threads that run queued jobs through the handler for their kind."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handlers: Dict[str, JobHandler],
+        workers: int = JOB_WORKERS,
+        heartbeat_interval: float = JOB_HEARTBEAT_SECONDS,
+    ):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.heartbeat_interval = heartbeat_interval
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._active = 0
+        self._active_lock = threading.Lock()
+
+    def start(self) -> None:
+        self._stopping.clear()
+        targets = [(self._heartbeat, "job-heartbeat")]
+        targets += [(self._work, f"job-worker-{i}") for i in range(self.workers)]
+        for target, name in targets:
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """Stop claiming new jobs; jobs already running are left to finish.
+
+        Their heartbeat continues until the last one is done.
+        """
+        self._stopping.set()
+        self._threads.clear()
+
+    def _heartbeat(self) -> None:
+        """Keep this pool's jobs alive and pick up jobs of pools that died."""
+        while True:
+            try:
+                self.queue.heartbeat()
+                if not self._stopping.is_set():
+                    requeued = self.queue.requeue_stale()
+                    if requeued:
+                        print(f"Requeued {requeued} interrupted jobs")
+            except sqlite3.Error as e:
+                print(f"Job heartbeat failed: {e}")
+            self._stopping.wait(self.heartbeat_interval)
+            with self._active_lock:
+                if self._stopping.is_set() and not self._active:
+                    return
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            with self._active_lock:
+                self._active += 1
+            try:
+                job = self.queue.claim(timeout=1.0)
+                if job is not None:
+                    self._run(job)
+            finally:
+                with self._active_lock:
+                    self._active -= 1
+
+    def _run(self, job: Dict[str, Any]) -> None:
+        try:
+            result = self.handlers[job["kind"]](self.queue, job)
+            self.queue.complete(job["id"], result)
+        except Exception as e:
+            print(f"Job {job['id']} failed: {e}")
+            self.queue.fail(job["id"], str(e))
@@ -0,0 +1,398 @@
+"""
+Markdown to Google Docs batchUpdate requests.
+
+The markdown is read in a single pass. It becomes one insertText for all of
+the body text plus style requests over merged ranges:
+- headings as paragraph styles
+- bold, italic, code and links as text styles
+- bullet and numbered lists, with nesting taken from leading tabs
+
+Markdown tables become native Docs tables.
+
+Requests are ordered so the precomputed indices stay valid while they are
+applied:
+1. Text and paragraph styles, in the coordinates of the inserted text.
+2. Bullets, last run first. createParagraphBullets strips the nesting tabs,
+   which shifts everything after the run.
+3. Tables, last table first, and within a table the last cell first. Each
+   insertion then only moves content that has already been written.
+
+Each table is inserted at the start of an empty NORMAL_TEXT paragraph written
+after it. insertTable adds a newline in front of the table, and the new
+paragraph takes the style of the one it splits; inserting into a heading
+would leave an empty heading behind.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)$")
+LIST_RE = re.compile(r"^(\s*)([-*+]|\d+[.)])\s+(.*)$")
+RULE_RE = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+TABLE_SEPARATOR_RE = re.compile(r"^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$")
+BR_RE = re.compile(r"<br\s*/?>", re.IGNORECASE)
+
+# Alternatives are tried left to right, so longer markers come first
+INLINE_RE = re.compile(
+    r"\*\*\*(?P<bold_italic>.+?)\*\*\*"
+    r"|\*\*(?P<bold>.+?)\*\*"
+    r"|(?<!\w)__(?P<bold_u>.+?)__(?!\w)"
+    r"|\*(?!\s)(?P<italic>.+?)(?<!\s)\*"
+    r"|(?<!\w)_(?!\s)(?P<italic_u>.+?)(?<!\s)_(?!\w)"
+    r"|`(?P<code>[^`]+)`"
+    r"|\[(?P<link_text>[^\]]+)\]\((?P<link_url>[^)\s]+)\)"
+)
+
+BULLET_PRESET = "BULLET_DISC_CIRCLE_SQUARE"
+NUMBERED_PRESET = "NUMBERED_DECIMAL_ALPHA_ROMAN"
+CODE_FONT = "Courier New"
+
+Style = Tuple[Tuple[str, object], ...]
+
+
+def utf16_len(text: str) -> int:
+    """Docs indices count UTF-16 code units, so emoji take two."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def parse_inline(text: str, style: Style = ()) -> List[Tuple[str, Style]]:
+    """Split inline markdown into (plain text, style) segments."""
+    segments: List[Tuple[str, Style]] = []
+    position = 0
+    for match in INLINE_RE.finditer(text):
+        if match.start() > position:
+            segments.append((text[position : match.start()], style))
+        kind = match.lastgroup
+        if kind == "link_url":
+            inner_style = style + (("link", match.group("link_url")),)
+            segments.extend(parse_inline(match.group("link_text"), inner_style))
+        elif kind == "code":
+            segments.append((match.group("code"), style + (("code", True),)))
+        else:
+            flags = {
+                "bold_italic": (("bold", True), ("italic", True)),
+                "bold": (("bold", True),),
+                "bold_u": (("bold", True),),
+                "italic": (("italic", True),),
+                "italic_u": (("italic", True),),
+            }[kind]
+            segments.extend(parse_inline(match.group(kind), style + flags))
+        position = match.end()
+    if position < len(text):
+        segments.append((text[position:], style))
+    return segments
+
+
+def text_style_request(start: int, end: int, style: Style) -> dict:
+    text_style: Dict[str, object] = {}
+    for name, value in style:
+        if name == "link":
+            text_style["link"] = {"url": value}
+        elif name == "code":
+            text_style["weightedFontFamily"] = {"fontFamily": CODE_FONT}
+        else:
+            text_style[name] = value
+    return {
+        "updateTextStyle": {
+            "range": {"startIndex": start, "endIndex": end},
+            "textStyle": text_style,
+            "fields": ",".join(text_style),
+        }
+    }
+
+
+def split_table_row(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    cells = re.split(r"(?<!\\)\|", line)
+    return [cell.strip().replace("\\|", "|") for cell in cells]
+
+
+@dataclass
+class Table:
+    index: int  # start of the empty paragraph the table is inserted into
+    rows: List[List[str]]
+
+
+@dataclass
+class DocsDocument:
+    """Text, style ranges and tables collected while parsing the markdown."""
+
+    start_index: int = 1
+    text: List[str] = field(default_factory=list)
+    index: int = 0
+    paragraph_runs: List[list] = field(default_factory=list)  # [style, start, end]
+    text_styles: List[list] = field(default_factory=list)  # [style, start, end]
+    bullet_runs: List[list] = field(default_factory=list)  # [preset, start, end]
+    tabs: List[Tuple[int, int]] = field(default_factory=list)  # (index, tabs)
+    tables: List[Table] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.index = self.start_index
+
+    def add_styled_text(self, segments: List[Tuple[str, Style]]) -> None:
+        for text, style in segments:
+            start, self.index = self.index, self.index + utf16_len(text)
+            self.text.append(text)
+            if not style or start == self.index:
+                continue
+            last = self.text_styles[-1] if self.text_styles else None
+            if last and last[0] == style and last[2] == start:
+                last[2] = self.index
+            else:
+                self.text_styles.append([style, start, self.index])
+
+    def add_paragraph(
+        self,
+        segments: List[Tuple[str, Style]],
+        named_style: str = "NORMAL_TEXT",
+        list_preset: Optional[str] = None,
+        level: int = 0,
+    ) -> None:
+        start = self.index
+        if list_preset and level:
+            self.tabs.append((start, level))
+            self.add_styled_text([("\t" * level, ())])
+        self.add_styled_text(segments)
+        self.add_styled_text([("\n", ())])
+
+        if named_style != "NORMAL_TEXT":
+            last = self.paragraph_runs[-1] if self.paragraph_runs else None
+            if last and last[0] == named_style and last[2] == start:
+                last[2] = self.index
+            else:
+                self.paragraph_runs.append([named_style, start, self.index])
+
+        if list_preset:
+            # Adjacent items share a run (and so one list) while the preset
+            # stays the same; Docs derives nesting from the leading tabs, so a
+            # nested list of another kind gets a run of its own
+            last = self.bullet_runs[-1] if self.bullet_runs else None
+            if last and last[2] == start and last[0] == list_preset:
+                last[2] = self.index
+            else:
+                self.bullet_runs.append([list_preset, start, self.index])
+
+    def add_table(self, rows: List[List[str]]) -> None:
+        self.tables.append(Table(index=self.index, rows=rows))
+        self.add_paragraph([])
+
+    def _tabs_before(self, index: int) -> int:
+        return sum(count for start, count in self.tabs if start < index)
+
+    def _table_requests(self, table: Table) -> List[dict]:
+        columns = max(len(row) for row in table.rows)
+        location = table.index - self._tabs_before(table.index)
+        requests = [
+            {
+                "insertTable": {
+                    "rows": len(table.rows),
+                    "columns": columns,
+                    "location": {"index": location},
+                }
+            }
+        ]
+        cells = [
+            (r, c, cell)
+            for r, row in enumerate(table.rows)
+            for c, cell in enumerate(row)
+        ]
+        for r, c, cell in reversed(cells):
+            if not cell:
+                continue
+            cell_index = location + 4 + r * (1 + 2 * columns) + 2 * c
+            header = (("bold", True),) if r == 0 else ()
+            segments = parse_inline(BR_RE.sub("\n", cell), header)
+            cell_doc = DocsDocument(start_index=cell_index)
+            cell_doc.add_styled_text(segments)
+            requests.append(
+                {
+                    "insertText": {
+                        "location": {"index": cell_index},
+                        "text": "".join(cell_doc.text),
+                    }
+                }
+            )
+            requests += [
+                text_style_request(start, end, style)
+                for style, start, end in cell_doc.text_styles
+            ]
+        return requests
+
+    def requests(self, reset_styles: bool = False) -> List[dict]:
+        """
+        The batchUpdate requests for this document. With `reset_styles` the
+        inserted text is first cleared of the heading, bullet and text styles
+        it inherits from the paragraph it was inserted into.
+        """
+        requests: List[dict] = []
+        if self.text:
+            requests.append(
+                {
+                    "insertText": {
+                        "location": {"index": self.start_index},
+                        "text": "".join(self.text),
+                    }
+                }
+            )
+        if reset_styles and self.text:
+            inserted = {"startIndex": self.start_index, "endIndex": self.index}
+            requests += [
+                {
+                    "updateParagraphStyle": {
+                        "range": inserted,
+                        "paragraphStyle": {"namedStyleType": "NORMAL_TEXT"},
+                        "fields": "namedStyleType",
+                    }
+                },
+                {"deleteParagraphBullets": {"range": inserted}},
+                {
+                    "updateTextStyle": {
+                        "range": inserted,
+                        "textStyle": {},
+                        "fields": "bold,italic,link,weightedFontFamily",
+                    }
+                },
+            ]
+        for named_style, start, end in self.paragraph_runs:
+            requests.append(
+                {
+                    "updateParagraphStyle": {
+                        "range": {"startIndex": start, "endIndex": end},
+                        "paragraphStyle": {"namedStyleType": named_style},
+                        "fields": "namedStyleType",
+                    }
+                }
+            )
+        requests += [
+            text_style_request(start, end, style)
+            for style, start, end in self.text_styles
+        ]
+        for preset, start, end in reversed(self.bullet_runs):
+            requests.append(
+                {
+                    "createParagraphBullets": {
+                        "range": {"startIndex": start, "endIndex": end},
+                        "bulletPreset": preset,
+                    }
+                }
+            )
+        for table in reversed(self.tables):
+            requests += self._table_requests(table)
+        return requests
+
+
+def markdown_to_document(
+    markdown: str, start_index: int = 1, trailing_blank: bool = False
+) -> DocsDocument:
+    """Parse markdown line by line into a DocsDocument.
+
+    `trailing_blank` keeps a final blank line as an empty paragraph, as it
+    would be if more markdown followed.
+    """
+    doc = DocsDocument(start_index=start_index)
+    table_rows: List[List[str]] = []
+    list_indents: List[int] = []
+    in_code_block = False
+    pending_blank = False
+    after_heading = False
+    after_table = False
+
+    def flush_table() -> None:
+        nonlocal after_table
+        if table_rows:
+            doc.add_table(list(table_rows))
+            table_rows.clear()
+            after_table = True
+
+    for line in markdown.split("\n"):
+        stripped = line.strip()
+
+        if stripped.startswith("```"):
+            flush_table()
+            in_code_block = not in_code_block
+            continue
+        if in_code_block:
+            doc.add_paragraph([(line.rstrip(), (("code", True),))])
+            continue
+
+        if stripped.startswith("|"):
+            if not TABLE_SEPARATOR_RE.match(stripped):
+                table_rows.append(split_table_row(stripped))
+            pending_blank = False
+            continue
+        flush_table()
+
+        if not stripped or RULE_RE.match(stripped):
+            # Keep one empty paragraph between blocks; headings already have
+            # spacing and a table is already followed by an empty paragraph
+            pending_blank = bool(doc.text) and not after_table and not after_heading
+            list_indents.clear()
+            continue
+        if pending_blank:
+            doc.add_paragraph([])
+            pending_blank = False
+
+        heading = HEADING_RE.match(stripped)
+        list_item = LIST_RE.match(line.replace("\t", "    "))
+        after_heading = bool(heading)
+        after_table = False
+        if heading:
+            list_indents.clear()
+            level = len(heading.group(1))
+            doc.add_paragraph(parse_inline(heading.group(2)), f"HEADING_{level}")
+        elif list_item:
+            indent = len(list_item.group(1))
+            while list_indents and list_indents[-1] > indent:
+                list_indents.pop()
+            if not list_indents or list_indents[-1] < indent:
+                list_indents.append(indent)
+            ordered = list_item.group(2)[0].isdigit()
+            doc.add_paragraph(
+                parse_inline(list_item.group(3)),
+                list_preset=NUMBERED_PRESET if ordered else BULLET_PRESET,
+                level=len(list_indents) - 1,
+            )
+        else:
+            list_indents.clear()
+            text = stripped[1:].lstrip() if stripped.startswith(">") else stripped
+            doc.add_paragraph(parse_inline(text))
+
+    flush_table()
+    if trailing_blank and pending_blank:
+        doc.add_paragraph([])
+    return doc
+
+
+def build_document_requests(
+    markdown: str,
+    start_index: int = 1,
+    trailing_blank: bool = False,
+    reset_styles: bool = False,
+) -> List[dict]:
+    """All batchUpdate requests needed to write `markdown` at `start_index`."""
+    doc = markdown_to_document(markdown, start_index, trailing_blank)
+    return doc.requests(reset_styles)
+
+
+def split_sections(markdown: str) -> List[str]:
+    """
+    Split markdown before every level 1 or 2 heading. The first item is the
+    text before the first heading, possibly empty, so each later item maps to
+    one HEADING_1/HEADING_2 paragraph in the written document.
+    """
+    sections: List[List[str]] = [[]]
+    in_code_block = False
+    for line in markdown.split("\n"):
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            in_code_block = not in_code_block
+        heading = None if in_code_block else HEADING_RE.match(stripped)
+        if heading and len(heading.group(1)) <= 2:
+            sections.append([])
+        sections[-1].append(line)
+    return ["\n".join(lines) for lines in sections]
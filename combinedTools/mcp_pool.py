@@ -0,0 +1,190 @@
+"""
+Process-wide cache of MCP tool registries.
+
+Building an `McpToolRegistry` starts the server (Apify LinkedIn scraper, Apify
+GitHub scraper, perplexity-ask) just to list its tools. The registry for each
+server is built lazily on first use and reused across requests, so the tool
+list is fetched once per process instead of on every call. Tool calls still
+open their own stdio session, so there is no long-lived server process to
+health-check. Instead a registry is dropped with `invalidate` whenever it
+looks broken (an expected tool is missing, or its connection fails) and the
+next `get` starts the server and lists its tools again. Only connection
+failures are retried; a tool or plan run that fails is not repeated.
+"""
+
+import os
+import json
+import logging
+import threading
+import anyio
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from dotenv import load_dotenv
+from mcp.shared.exceptions import McpError
+from portia import McpToolRegistry
+
+load_dotenv()
+
+APIFY_LINKEDIN = "apify_linkedin"
+APIFY_GITHUB = "apify_github"
+PERPLEXITY = "perplexity"
+
+T = TypeVar("T")
+
+# Failures of the stdio connection itself, as opposed to a tool or plan failing
+MCP_CONNECTION_ERRORS = (
+    McpError,
+    OSError,
+    EOFError,
+    anyio.BrokenResourceError,
+    anyio.ClosedResourceError,
+    anyio.EndOfStream,
+)
+
+@dataclass
+class McpServerSpec:
+    server_name: str
+    command: str
+    args: List[str]
+    env_vars: List[str] = field(default_factory=list)
+
+    def env(self) -> Dict[str, Optional[str]]:
+        return {name: os.getenv(name) for name in self.env_vars}
+
+
+MCP_SERVERS: Dict[str, McpServerSpec] = {
+    APIFY_LINKEDIN: McpServerSpec(
+        server_name="apify",
+        command="npx",
+        args=[
+            "-y",
+            "@apify/actors-mcp-server",
+            "--actors",
+            "curious_coder/linkedin-profile-scraper",
+        ],
+        env_vars=["APIFY_TOKEN"],
+    ),
+    APIFY_GITHUB: McpServerSpec(
+        server_name="apify",
+        command="npx",
+        args=[
+            "-y",
+            "@apify/actors-mcp-server",
+            "--actors",
+            "saswave/github-profile-scraper",
+        ],
+        env_vars=["APIFY_TOKEN"],
+    ),
+    PERPLEXITY: McpServerSpec(
+        server_name="perplexity-ask",
+        command="npx",
+        args=["-y", "server-perplexity-ask"],
+        env_vars=["PERPLEXITY_API_KEY"],
+    ),
+}
+
+
+class McpServerPool:
+    """Lazily built MCP registries, cached for the whole process."""
+
+    def __init__(self, servers: Dict[str, McpServerSpec]):
+        self._servers = servers
+        self._registries: Dict[str, McpToolRegistry] = {}
+        self._locks = {name: threading.Lock() for name in servers}
+        self._listeners: List[Callable[[str, McpToolRegistry], None]] = []
+
+    def get(self, name: str) -> McpToolRegistry:
+        """Return the cached registry for `name`, building it on first use."""
+        if name not in self._servers:
+            raise ValueError(f"Unknown MCP server: {name}")
+
+        with self._locks[name]:
+            registry = self._registries.get(name)
+            if registry is None:
+                registry = self._build(name)
+                self._registries[name] = registry
+            return registry
+
+    def invalidate(self, name: str) -> None:
+        """Drop the registry for `name` so the next `get` lists the tools again."""
+        with self._locks[name]:
+            registry = self._registries.pop(name, None)
+        if registry is None:
+            return
+        logging.info(f"Dropped MCP registry for '{name}'")
+        for listener in self._listeners:
+            listener(name, registry)
+
+    def add_invalidation_listener(
+        self, listener: Callable[[str, McpToolRegistry], None]
+    ) -> None:
+        """Call `listener(name, old_registry)` whenever a registry is dropped."""
+        self._listeners.append(listener)
+
+    def _build(self, name: str) -> McpToolRegistry:
+        spec = self._servers[name]
+        logging.info(f"Listing MCP tools for '{name}': {spec.command} {spec.args}")
+        return McpToolRegistry.from_stdio_connection(
+            server_name=spec.server_name,
+            command=spec.command,
+            args=spec.args,
+            env=spec.env(),
+        )
+
+
+mcp_pool = McpServerPool(MCP_SERVERS)
+
+
+def get_mcp_registry(name: str) -> McpToolRegistry:
+    """Return the cached registry for APIFY_LINKEDIN, APIFY_GITHUB or PERPLEXITY."""
+    return mcp_pool.get(name)
+
+
+def is_mcp_connection_error(error: BaseException) -> bool:
+    """Whether `error` (or every error in an exception group) is a connection failure."""
+    if isinstance(error, BaseExceptionGroup):
+        return all(is_mcp_connection_error(e) for e in error.exceptions)
+    return isinstance(error, MCP_CONNECTION_ERRORS)
+
+
+def call_with_fresh_registry(name: str, call: Callable[[], T]) -> T:
+    """Run `call`; if the MCP connection fails, rebuild the registry and retry once.
+
+    Any other failure, such as a plan run that ends FAILED, is raised as is so
+    paid actor runs are not repeated. `call` must fetch the registry (and
+    anything built from it) itself so the retry picks up the rebuilt one.
+    """
+    try:
+        return call()
+    except Exception as e:
+        if not is_mcp_connection_error(e):
+            raise
+        logging.warning(
+            f"MCP connection for '{name}' failed ({e}), rebuilding registry"
+        )
+        mcp_pool.invalidate(name)
+        return call()
+
+
+def parse_mcp_items(result: Any) -> List[Dict[str, Any]]:
+    """Flatten an MCP tool result (JSON text, content blocks or items) into dicts."""
+    if isinstance(result, str):
+        try:
+            result = json.loads(result)
+        except json.JSONDecodeError:
+            return []
+    if isinstance(result, dict):
+        if "content" in result:
+            return parse_mcp_items(result["content"])
+        if "items" in result:
+            return parse_mcp_items(result["items"])
+        if "text" in result and "type" in result:
+            return parse_mcp_items(result["text"])
+        return [result]
+    if isinstance(result, list):
+        items = []
+        for item in result:
+            items.extend(parse_mcp_items(item))
+        return items
+    return []
@@ -0,0 +1,113 @@
+"""
+Process-wide cache of built Portia plans.
+
+Plans are built once on first use and reused for every later run. Each entry
+is keyed by plan name and the set of tool IDs the plan invokes. When the MCP
+pool drops a registry, the tool IDs looked up through it are forgotten and
+every plan invoking one of them is dropped, so the next run resolves the tool
+again and rebuilds the plan.
+"""
+
+import logging
+import threading
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from portia import ToolRegistry
+from portia.builder.plan_v2 import PlanV2
+
+from combinedTools.mcp_pool import get_mcp_registry, mcp_pool
+
+
+class PlanCache:
+    """Build-once cache of plans keyed by (plan name, tool-ID set)."""
+
+    def __init__(self):
+        self._plans: Dict[str, Tuple[FrozenSet[str], PlanV2]] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self, name: str, tool_ids: Iterable[str], build: Callable[[], PlanV2]
+    ) -> PlanV2:
+        key = frozenset(tool_ids)
+        with self._lock:
+            cached = self._plans.get(name)
+            if cached and cached[0] == key:
+                return cached[1]
+            if cached:
+                logging.info(f"Tool IDs changed for plan '{name}', rebuilding")
+
+            plan = build()
+            self._plans[name] = (key, plan)
+            logging.info(f"Built and cached plan '{name}'")
+            return plan
+
+    def invalidate_tools(self, tool_ids: Iterable[str]) -> None:
+        """Drop every cached plan that invokes one of `tool_ids`."""
+        tool_ids = frozenset(tool_ids)
+        with self._lock:
+            for name in [n for n, (key, _) in self._plans.items() if key & tool_ids]:
+                logging.info(f"Dropping cached plan '{name}'")
+                del self._plans[name]
+
+
+plan_cache = PlanCache()
+
+_tool_ids: Dict[Tuple[int, str], Tuple[ToolRegistry, str]] = {}
+_tool_ids_lock = threading.Lock()
+
+
+def get_plan(name: str, tool_ids: Iterable[str], build: Callable[[], PlanV2]) -> PlanV2:
+    """Return the cached plan for `name`, building it on first use."""
+    return plan_cache.get(name, tool_ids, build)
+
+
+def find_tool_id(
+    registry: ToolRegistry, cache_key: str, predicate: Callable[[str], bool]
+) -> Optional[str]:
+    """Find the first tool ID in `registry` matching `predicate`.
+
+    The registry walk happens once per registry instance; a registry rebuilt
+    by the MCP pool gets a fresh lookup.
+    """
+    key = (id(registry), cache_key)
+    with _tool_ids_lock:
+        cached = _tool_ids.get(key)
+        if cached and cached[0] is registry:
+            return cached[1]
+
+    available_tools = [t.id for t in registry.get_tools()]
+    logging.info(f"Available tools: {available_tools}")
+    tool_id = next((tid for tid in available_tools if predicate(tid)), None)
+
+    if tool_id:
+        with _tool_ids_lock:
+            _tool_ids[key] = (registry, tool_id)
+    return tool_id
+
+
+def _forget_registry(server: str, registry: ToolRegistry) -> None:
+    """Pool listener: forget tool IDs found in `registry` and the plans using them."""
+    with _tool_ids_lock:
+        stale = [key for key, (reg, _) in _tool_ids.items() if reg is registry]
+        tool_ids = [_tool_ids.pop(key)[1] for key in stale]
+    plan_cache.invalidate_tools(tool_ids)
+
+
+mcp_pool.add_invalidation_listener(_forget_registry)
+
+
+def find_mcp_tool_id(
+    server: str, cache_key: str, predicate: Callable[[str], bool]
+) -> Optional[str]:
+    """Find a tool ID on a pooled MCP server, relisting its tools once if missing.
+
+    A registry built while the server was failing (bad token, expired trial,
+    startup error) lacks the tool; dropping it lets the process recover
+    without a restart.
+    """
+    tool_id = find_tool_id(get_mcp_registry(server), cache_key, predicate)
+    if tool_id is None:
+        logging.warning(f"'{cache_key}' not found on MCP server '{server}', relisting")
+        mcp_pool.invalidate(server)
+        tool_id = find_tool_id(get_mcp_registry(server), cache_key, predicate)
+    return tool_id
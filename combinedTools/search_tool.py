@@ -4,11 +4,15 @@ import os
 from dotenv import load_dotenv
 from portia import (
     Config,
-    McpToolRegistry,
     Portia,
     StorageClass,
 )
 from portia.cli import CLIExecutionHooks
+from combinedTools.mcp_pool import (
+    PERPLEXITY,
+    call_with_fresh_registry,
+    get_mcp_registry,
+)
 
 load_dotenv()
 
@@ -17,22 +21,17 @@ def search_company_news(query: str) -> str:
     """Search company/news/attendee info via Perplexity and return clean summary or text."""
     my_config = Config.from_default(storage_class=StorageClass.CLOUD)
 
-    registry = McpToolRegistry.from_stdio_connection(
-        server_name="perplexity-ask",
-        command="npx",
-        args=["-y", "server-perplexity-ask"],
-        env={"PERPLEXITY_API_KEY": os.getenv("PERPLEXITY_API_KEY")},
-    )
-
-    portia = Portia(
-        config=my_config,
-        tools=registry,
-        execution_hooks=CLIExecutionHooks(),
-    )
-    available_tools = [t.id for t in portia.tool_registry.get_tools()]
-    logging.info(f"Available tools: {available_tools}")
-
-    finalResult = portia.run(query).outputs.final_output
+    def run():
+        portia = Portia(
+            config=my_config,
+            tools=get_mcp_registry(PERPLEXITY),
+            execution_hooks=CLIExecutionHooks(),
+        )
+        available_tools = [t.id for t in portia.tool_registry.get_tools()]
+        logging.info(f"Available tools: {available_tools}")
+        return portia.run(query).outputs.final_output
+
+    finalResult = call_with_fresh_registry(PERPLEXITY, run)
     raw_value = finalResult.value
     parsed = json.loads(raw_value)
     
@@ -0,0 +1,316 @@
+"""
+Compact JSON payload for the meeting summary prompt.
+
+The raw LinkedIn scraper objects carry far more than the prep document uses
+(logos, URNs, tracking fields, every past position). This module keeps only
+the fields the document draws on, ranks and truncates long lists, attaches
+each GitHub analysis to its attendee and encodes the result once. If the
+payload is over the token budget, lists and long strings are shrunk further
+until it fits.
+"""
+
+import os
+import re
+import json
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+try:
+    import tiktoken
+except ImportError:  # optional, token counts fall back to an estimate
+    tiktoken = None
+
+load_dotenv()
+
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "12000"))
+
+# Canonical field -> the names different scraper actors use for it
+PROFILE_FIELDS = {
+    "name": ("fullName", "name"),
+    "headline": ("headline", "occupation"),
+    "location": ("addressWithCountry", "location", "geoLocationName"),
+    "about": ("about", "summary"),
+    "company": ("companyName", "currentCompany"),
+    "followers": ("followers", "followersCount", "connections"),
+    "linkedin_url": ("linkedinUrl", "linkedInUrl", "profileUrl", "url"),
+}
+
+# Canonical list -> (source names, how many items to keep at full budget)
+PROFILE_LISTS = {
+    "experience": (("experiences", "experience", "positions"), 5),
+    "education": (("educations", "education"), 3),
+    "skills": (("skills",), 15),
+    "certifications": (("licenseAndCertificates", "certifications"), 5),
+    "languages": (("languages",), 5),
+    "honors": (("honorsAndAwards", "honors", "awards"), 5),
+    "projects": (("projects",), 5),
+}
+
+GITHUB_FIELDS = (
+    "profile_overview",
+    "achievements",
+    "tech_stack",
+    "skills_assessment",
+    "activity_summary",
+    "social_links",
+)
+GITHUB_REPO_LIMIT = 5
+
+# Keys inside list items that never help the document
+NOISE_KEY_PARTS = ("logo", "image", "picture", "photo", "thumbnail", "urn", "tracking")
+
+MAX_STRING_CHARS = 400
+MAX_RESEARCH_CHARS = 4000
+
+# Successive shrink factors tried until the payload fits the budget
+SHRINK_FACTORS = (1.0, 0.5, 0.25, 0.1)
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken when available, otherwise ~4 chars per token."""
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text))
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    return text[: max(0, max_chars - 3)].rstrip() + "..."
+
+
+def _compact(value: Any, max_chars: int) -> Any:
+    """Drop empty values and noise keys, truncate strings, flatten text blocks."""
+    if isinstance(value, str):
+        return _truncate(value.strip(), max_chars)
+    if isinstance(value, dict):
+        if set(value) == {"text"}:
+            return _compact(value["text"], max_chars)
+        compacted = {}
+        for key, item in value.items():
+            if any(part in key.lower() for part in NOISE_KEY_PARTS):
+                continue
+            if key == "id" or key.endswith(("Id", "Urn")):
+                continue
+            item = _compact(item, max_chars)
+            if item not in (None, "", [], {}):
+                compacted[key] = item
+        return compacted
+    if isinstance(value, list):
+        items = [_compact(item, max_chars) for item in value]
+        return [item for item in items if item not in (None, "", [], {})]
+    return value
+
+
+def _first(profile: Dict[str, Any], names: Tuple[str, ...]) -> Any:
+    for name in names:
+        if profile.get(name) not in (None, "", [], {}):
+            return profile[name]
+    return None
+
+
+def _skill_name(skill: Any) -> Optional[str]:
+    if isinstance(skill, dict):
+        return skill.get("title") or skill.get("name")
+    return skill if isinstance(skill, str) else None
+
+
+def compact_linkedin_profile(profile: Any, scale: float = 1.0) -> Any:
+    """Keep the profile fields the prep document uses; pass notes through."""
+    if not isinstance(profile, dict):
+        return profile
+    max_chars = max(80, int(MAX_STRING_CHARS * scale))
+
+    compacted: Dict[str, Any] = {}
+    for field, names in PROFILE_FIELDS.items():
+        value = _first(profile, names)
+        if value is not None:
+            compacted[field] = _compact(value, max_chars * 2)
+    if "name" not in compacted and profile.get("firstName"):
+        compacted["name"] = f"{profile['firstName']} {profile.get('lastName', '')}"
+
+    for field, (names, limit) in PROFILE_LISTS.items():
+        items = _first(profile, names)
+        if not isinstance(items, list):
+            continue
+        limit = max(1, int(limit * scale))
+        if field == "skills":
+            skills = [name for name in map(_skill_name, items) if name]
+            compacted[field] = skills[:limit]
+        else:
+            compacted[field] = _compact(items[:limit], max_chars)
+    return compacted
+
+
+def _stars(repo: Any) -> float:
+    if not isinstance(repo, dict):
+        return 0
+    try:
+        return float(str(repo.get("stars", 0)).replace(",", ""))
+    except ValueError:
+        return 0
+
+
+def compact_github_analysis(analysis: Any, scale: float = 1.0) -> Any:
+    """Keep the analysis sections the document uses, top repos by stars first."""
+    if not isinstance(analysis, dict):
+        return analysis
+    max_chars = max(80, int(MAX_STRING_CHARS * scale))
+
+    compacted = {
+        field: _compact(analysis[field], max_chars)
+        for field in GITHUB_FIELDS
+        if analysis.get(field) not in (None, "", [], {})
+    }
+    repos = analysis.get("pinned_repositories")
+    if isinstance(repos, list):
+        limit = max(1, int(GITHUB_REPO_LIMIT * scale))
+        ranked = sorted(repos, key=_stars, reverse=True)[:limit]
+        compacted["pinned_repositories"] = _compact(ranked, max_chars)
+    return compacted
+
+
+def github_username(analysis: Any) -> str:
+    if not isinstance(analysis, dict):
+        return ""
+    overview = analysis.get("profile_overview") or {}
+    if not isinstance(overview, dict):
+        return ""
+    return str(overview.get("username") or "").lower()
+
+
+def _as_dict(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return value
+
+
+def match_github_analyses(
+    attendees: List[Dict[str, Any]], github_analyses: List[Any]
+) -> Tuple[List[List[Any]], List[Any]]:
+    """Pair each analysis with the attendee whose data links to that username.
+
+    Returns the analyses per attendee (in attendee order) and the ones that
+    could not be matched to anybody.
+    """
+    haystacks = [
+        json.dumps(attendee, ensure_ascii=False, default=str).lower()
+        for attendee in attendees
+    ]
+    matched: List[List[Any]] = [[] for _ in attendees]
+    unmatched = []
+    for analysis in github_analyses or []:
+        username = github_username(analysis)
+        link = re.compile(rf"github\.com/{re.escape(username)}(?![\w-])")
+        for index, haystack in enumerate(haystacks):
+            if username and link.search(haystack):
+                matched[index].append(analysis)
+                break
+        else:
+            unmatched.append(analysis)
+    return matched, unmatched
+
+
+def build_attendee_payload(
+    attendee: Dict[str, Any], github_analyses: List[Any], scale: float = 1.0
+) -> Dict[str, Any]:
+    """Compact view of one attendee: identity, LinkedIn profile and GitHub."""
+    payload = {"name": attendee.get("name"), "email": attendee.get("email")}
+    if attendee.get("email_summaries"):
+        payload["email_summaries"] = attendee["email_summaries"]
+    payload["linkedin"] = compact_linkedin_profile(attendee.get("enriched"), scale)
+    if github_analyses:
+        payload["github"] = [
+            compact_github_analysis(analysis, scale) for analysis in github_analyses
+        ]
+    return payload
+
+
+def _research_text(perplexity_result: Any) -> Optional[str]:
+    if not perplexity_result:
+        return None
+    if isinstance(perplexity_result, dict):
+        try:
+            return perplexity_result["content"][0]["text"]
+        except (KeyError, IndexError, TypeError):
+            pass
+    if isinstance(perplexity_result, str):
+        return perplexity_result
+    return json.dumps(perplexity_result, ensure_ascii=False, default=str)
+
+
+def split_summary_inputs(
+    enriched_data: Any, github_analyses: List[Any]
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]], List[List[Any]], List[Any]]:
+    """Meeting fields, attendees, their GitHub analyses and the unmatched ones."""
+    enriched_data = _as_dict(enriched_data) or {}
+    meeting = {
+        "meeting_title": enriched_data.get("meeting_title"),
+        "organizer_email": enriched_data.get("organizer_email"),
+    }
+    attendees = [_as_dict(a) for a in enriched_data.get("attendees", [])]
+    per_attendee, unmatched = match_github_analyses(attendees, github_analyses)
+    return meeting, attendees, per_attendee, unmatched
+
+
+def fit_to_budget(
+    build: Callable[[float], Dict[str, Any]], token_budget: int
+) -> Tuple[str, int]:
+    """Encode `build(scale)` at shrinking scales until it fits `token_budget`."""
+    for scale in SHRINK_FACTORS:
+        text = json.dumps(build(scale), ensure_ascii=False, default=str)
+        tokens = count_tokens(text)
+        if tokens <= token_budget:
+            break
+    return text, tokens
+
+
+def build_summary_payload(
+    enriched_data: Any,
+    github_analyses: List[Any],
+    perplexity_result: Any = None,
+    token_budget: int = SUMMARY_TOKEN_BUDGET,
+) -> Tuple[str, int]:
+    """Encode the summary inputs once, shrinking them to fit `token_budget`.
+
+    Returns the JSON text and its token count.
+    """
+    meeting, attendees, per_attendee, unmatched = split_summary_inputs(
+        enriched_data, github_analyses
+    )
+    research = _research_text(perplexity_result)
+
+    def build(scale: float) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            **meeting,
+            "attendees": [
+                build_attendee_payload(attendee, analyses, scale)
+                for attendee, analyses in zip(attendees, per_attendee)
+            ],
+        }
+        if unmatched:
+            payload["other_github_profiles"] = [
+                compact_github_analysis(analysis, scale) for analysis in unmatched
+            ]
+        if research:
+            payload["company_research"] = _truncate(
+                research, int(MAX_RESEARCH_CHARS * scale)
+            )
+        return payload
+
+    text, tokens = fit_to_budget(build, token_budget)
+    print(f"Summary payload: {tokens} tokens (budget {token_budget})")
+    return text, tokens
@@ -0,0 +1,159 @@
+"""
+The full meeting-prep workflow, split into stages.
+
+`iter_workflow_stages` yields `(stage, result)` pairs as soon as each stage
+finishes, so callers can persist or stream partial prep; `run_meeting_workflow`
+just collects them into the final response.
+"""
+
+import json
+from typing import Any, Dict, Iterator, Tuple
+
+from combinedTools.get_meeting_email import (
+    MEETING_CONCURRENCY,
+    get_all_meetings_and_emails,
+    get_meetings_and_emails,
+)
+from combinedTools.enrich_tools import research_attendees, research_meetings
+from combinedTools.github_url_extractor import find_github_urls
+from combinedTools.githubProfileAnalsyer import (
+    analyze_github_profiles,
+    analyze_github_profiles_by_username,
+    valid_github_usernames,
+)
+from combinedTools.create_meet_summary import create_meeting_summary
+from combinedTools.google_docs_creation import create_google_docs_summary
+from combinedTools.concurrency import run_concurrently
+
+Stage = Tuple[str, Any]
+
+
+def to_jsonable(value: Any) -> Any:
+    """Convert pydantic models nested in stage results to plain JSON types."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, dict):
+        return {key: to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    return value
+
+
+def iter_meeting_stages(todaysDate: str) -> Iterator[Stage]:
+    """Prepare the first meeting of the day, one stage at a time."""
+    meetings = get_meetings_and_emails(todaysDate)
+    print("\n--- Meeting Data and past conversations with Attendees: ---", meetings)
+    yield "meetings", meetings
+
+    enriched_data = research_attendees(meetings, batch=True)
+    print("\n--- Full Enriched Attendee Data ---")
+    print(json.dumps(to_jsonable(enriched_data), indent=2))
+    yield "enriched_data", enriched_data
+
+    print("\n--- Finding GitHub URLs in Attendee Data ---")
+    github_urls = find_github_urls(enriched_data)
+    print(f"Extracted GitHub URLs: {github_urls}")
+    all_analyses = analyze_github_profiles(github_urls)
+    if all_analyses:
+        print("\n--- GitHub Profile Analyses ---")
+        print(json.dumps(all_analyses, indent=2))
+    yield "github_analyses", all_analyses
+
+    print("\n--- Generating Meeting Summary Document ---")
+    summary_file = create_meeting_summary(enriched_data, all_analyses)
+    if summary_file:
+        print(f"Meeting summary generated successfully: {summary_file}")
+    yield "summary", summary_file
+
+    doc_url = create_google_docs_summary(summary_file, meetings.get("event_id"))
+    if doc_url:
+        print(
+            f"Google Docs summary created successfully Click here to view: {doc_url}"
+        )
+    yield "doc_url", doc_url
+
+
+def iter_all_meetings_stages(todaysDate: str) -> Iterator[Stage]:
+    """Prepare one doc per meeting of the day, researching each person once."""
+    meetings = get_all_meetings_and_emails(todaysDate)
+    print(f"\n--- Found {len(meetings)} meetings ---")
+    yield "meetings", meetings
+
+    # Meetings whose email summary failed are reported but not prepared
+    ready = [meeting for meeting in meetings if not meeting.get("error")]
+    enriched_meetings = research_meetings(ready, batch=True) if ready else []
+    yield "enriched_data", enriched_meetings
+
+    # Analyze everyone once, so a profile that fails is not retried per meeting
+    usernames = [
+        valid_github_usernames(find_github_urls(enriched))
+        for enriched in enriched_meetings
+    ]
+    by_username = analyze_github_profiles_by_username(
+        [username for names in usernames for username in names]
+    )
+    analyses = [
+        [by_username[name] for name in names if name in by_username]
+        for names in usernames
+    ]
+    yield "github_analyses", analyses
+
+    def prepare(index: int) -> dict:
+        enriched_data = enriched_meetings[index]
+        summary_file = create_meeting_summary(enriched_data, analyses[index])
+        doc_url = (
+            create_google_docs_summary(summary_file, ready[index].get("event_id"))
+            if summary_file
+            else None
+        )
+        print(f"Prepared '{enriched_data.meeting_title}': {doc_url}")
+        return {
+            "doc_url": doc_url,
+            "summary": summary_file,
+            "meeting": ready[index],
+            "enriched_data": enriched_data,
+            "github_analyses": analyses[index],
+        }
+
+    def on_error(index: int, error: Exception) -> dict:
+        print(f"Failed to prepare meeting {index}: {error}")
+        return {"meeting": ready[index], "error": str(error)}
+
+    prepared = iter(
+        run_concurrently(
+            range(len(ready)),
+            prepare,
+            max_concurrency=MEETING_CONCURRENCY,
+            on_error=on_error,
+        )
+    )
+    yield "documents", [
+        {"meeting": meeting, "error": meeting["error"]}
+        if meeting.get("error")
+        else next(prepared)
+        for meeting in meetings
+    ]
+
+
+def iter_workflow_stages(todaysDate: str, all_meetings: bool = False):
+    if all_meetings:
+        return iter_all_meetings_stages(todaysDate)
+    return iter_meeting_stages(todaysDate)
+
+
+def run_meeting_workflow(todaysDate: str, all_meetings: bool = False) -> Dict:
+    """Run every stage and return the combined workflow response."""
+    stages = dict(iter_workflow_stages(todaysDate, all_meetings))
+    if all_meetings:
+        return {
+            "message": "Full meeting workflow completed successfully!",
+            "meetings": stages["documents"],
+        }
+    return {
+        "doc_url": stages["doc_url"] or None,
+        "summary": stages["summary"] or None,
+        "message": "Full meeting workflow completed successfully!",
+        "meetings": stages["meetings"],
+        "enriched_data": stages["enriched_data"],
+        "github_analyses": stages["github_analyses"],
+    }
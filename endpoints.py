@@ -1,21 +1,48 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
 from typing import Optional
-from combinedTools.get_meeting_email import get_meetings_and_emails
+from combinedTools.get_meeting_email import (
+    get_all_meetings_and_emails,
+    get_meetings_and_emails,
+)
 from combinedTools.enrich_tools import research_attendees
 from combinedTools.github_url_extractor import find_github_urls
-from combinedTools.githubProfileAnalsyer import analyze_github_profile
-from combinedTools.create_meet_summary import create_meeting_summary
+from combinedTools.githubProfileAnalsyer import analyze_github_profiles
+from combinedTools.create_meet_summary import (
+    create_meeting_summary,
+    stream_meeting_summary,
+)
 from combinedTools.google_docs_creation import create_google_docs_summary
 from combinedTools.search_tool import search_company_news
+from combinedTools.execution import ConcurrencyLimiter, ConcurrencyLimitExceeded
+from combinedTools.job_queue import QUEUED, JobQueue, JobWorkerPool
+from combinedTools.workflow import (
+    iter_workflow_stages,
+    run_meeting_workflow,
+    to_jsonable,
+)
+from contextlib import asynccontextmanager
 import datetime
 
 from fastapi.middleware.cors import CORSMiddleware
 import requests
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import json
 
-app = FastAPI()
+WORKFLOW_JOB = "full-meeting-workflow"
+
+job_queue = JobQueue()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    workers = JobWorkerPool(job_queue, {WORKFLOW_JOB: run_workflow_job})
+    workers.start()
+    yield
+    workers.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 app.add_middleware(
@@ -27,6 +54,26 @@ app.add_middleware(
 )
 
 
+# ====== CONCURRENCY LIMITS ======
+# (running, queued) per endpoint, overridable via <NAME>_CONCURRENCY / _QUEUE_SIZE
+meetings_limiter = ConcurrencyLimiter.from_env("get-meetings", 4, 8)
+research_limiter = ConcurrencyLimiter.from_env("research-attendees", 4, 8)
+github_limiter = ConcurrencyLimiter.from_env("analyze-github", 4, 8)
+summary_limiter = ConcurrencyLimiter.from_env("generate-summary", 4, 8)
+search_limiter = ConcurrencyLimiter.from_env("search-information", 8, 16)
+docs_limiter = ConcurrencyLimiter.from_env("create-docs", 8, 16)
+workflow_limiter = ConcurrencyLimiter.from_env("full-workflow", 2, 4, retry_after=120)
+
+
+@app.exception_handler(ConcurrencyLimitExceeded)
+async def concurrency_limit_handler(request: Request, exc: ConcurrencyLimitExceeded):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 # ====== MODELS ======
 class DateRequest(BaseModel):
     date: str
@@ -34,6 +81,8 @@ class DateRequest(BaseModel):
 
 class AttendeeRequest(BaseModel):
     meetings: dict
+    batch: bool = False
+    force_refresh: bool = False
 
 
 class GithubRequest(BaseModel):
@@ -43,11 +92,13 @@ class GithubRequest(BaseModel):
 class SummaryRequest(BaseModel):
     enriched_data: dict
     github_analyses: list
+    map_reduce: bool = False
 
 
 class DocsRequest(BaseModel):
     markdown: str
     search_markdown: Optional[str] = None
+    event_id: Optional[str] = None
 
 
 class SearchRequest(BaseModel):
@@ -58,59 +109,98 @@ class SearchRequest(BaseModel):
 
 
 @app.get("/")
-def root():
+async def root():
     return {"message": "Hello from endpoints.py"}
 
 
 @app.get("/get-meetings")
-def get_meetings(date: str = None):
+async def get_meetings(date: str = None, all_meetings: bool = False):
     if not date:
         date = datetime.date.today().isoformat()
-    meetings = get_meetings_and_emails(date)
+    if all_meetings:
+        meetings = await meetings_limiter.run(get_all_meetings_and_emails, date)
+    else:
+        meetings = await meetings_limiter.run(get_meetings_and_emails, date)
     return {"meetings": meetings}
 
 
 @app.post("/research-attendees")
-def research_attendees_api(req: AttendeeRequest):
-    enriched = research_attendees(req.meetings)
+async def research_attendees_api(req: AttendeeRequest):
+    enriched = await research_limiter.run(
+        research_attendees,
+        req.meetings,
+        batch=req.batch,
+        force_refresh=req.force_refresh,
+    )
     return {"enriched_data": enriched}
 
 
 @app.post("/analyze-github")
-def analyze_github_api(req: GithubRequest):
+async def analyze_github_api(req: GithubRequest):
     urls = find_github_urls(req.enriched_data)
-    analyses = []
-    for url in urls:
-        username = url.split("/")[-1]
-        if username:
-            analysis = analyze_github_profile(username)
-            analyses.append(analysis)
+    analyses = await github_limiter.run(analyze_github_profiles, urls)
     return {"github_analyses": analyses}
 
 
+SUMMARY_STREAM_ERROR = "\n\n<!-- summary-error: {error} -->\n"
+
+
 @app.post("/generate-summary")
-def generate_summary_api(req: SummaryRequest):
-    summary_file = create_meeting_summary(req.enriched_data, req.github_analyses)
+async def generate_summary_api(req: SummaryRequest, stream: bool = False):
+    """
+    With `stream=true` the markdown is streamed as it is generated. A failure
+    after the response has started ends the body with SUMMARY_STREAM_ERROR and
+    aborts the connection instead of completing it.
+    """
+    if stream:
+        if req.map_reduce:
+            raise HTTPException(
+                status_code=400, detail="map_reduce can't be combined with stream"
+            )
+        chunks = summary_limiter.stream(
+            stream_meeting_summary(req.enriched_data, req.github_analyses)
+        )
+
+        async def body():
+            try:
+                async for chunk in chunks:
+                    yield chunk
+            except Exception as e:
+                yield SUMMARY_STREAM_ERROR.format(error=str(e).replace("--", "- -"))
+                raise
+
+        return StreamingResponse(body(), media_type="text/markdown")
+
+    summary_file = await summary_limiter.run(
+        create_meeting_summary,
+        req.enriched_data,
+        req.github_analyses,
+        map_reduce=req.map_reduce,
+    )
     return {"summary_file": summary_file}
 
 
 @app.post("/search-information")
-def search_company_news_api(req: SearchRequest):
+async def search_company_news_api(req: SearchRequest):
     try:
-        result = search_company_news(req.query)
+        result = await search_limiter.run(search_company_news, req.query)
         return result["content"][0]["text"]
 
+    except ConcurrencyLimitExceeded:
+        raise
     except Exception as e:
         return {"success": False, "error": str(e), "query": req.query}
 
 
 @app.post("/create-docs")
-def create_docs_api(req: DocsRequest):
+async def create_docs_api(req: DocsRequest):
     if req.search_markdown:
         combined_markdown = req.markdown + "\n\n" + req.search_markdown
     else:
         combined_markdown = req.markdown
-    doc_url = create_google_docs_summary(combined_markdown)
+    doc_url = await docs_limiter.run(
+        create_google_docs_summary, combined_markdown, req.event_id
+    )
     return {"doc_url": doc_url}
 
 
@@ -145,65 +235,79 @@ def create_docs_api(req: DocsRequest):
 #   ------ One click endpoint ----- to trigger all tools at once
 
 
-@app.post("/run-full-meeting-workflow")
-def run_full_meeting_workflow():
-    todaysDate = datetime.date.today().isoformat()
-
+def run_workflow_safely(todaysDate: str, all_meetings: bool = False):
     try:
-        meetings = get_meetings_and_emails(todaysDate)
-
-        print("\n--- Meeting Data and past conversations with Attendees: ---", meetings)
-        enriched_data = research_attendees(meetings)
-
-        print("\n--- Full Enriched Attendee Data ---")
-        if hasattr(enriched_data, "model_dump"):
-            print(json.dumps(enriched_data.model_dump(), indent=2))
-        else:
-            print(json.dumps(enriched_data, indent=2))
-        print("\n--- Finding GitHub URLs in Attendee Data ---")
-        github_urls = find_github_urls(enriched_data)
-        print(f"Extracted GitHub URLs: {github_urls}")
-
-        all_analyses = []
-
-        if github_urls:
-            for url in github_urls:
-                try:
-                    username = url.split("/")[-1]
-                    if username:
-                        print(f"\n--- Analyzing GitHub Profile: {username} ---")
-                        analysis = analyze_github_profile(username)
-                        all_analyses.append(analysis)
-                        print(f"Successfully analyzed GitHub profile: {username}")
-
-                except Exception as analysis_error:
-                    print(f"Failed to analyze profile at {url}: {analysis_error}")
-
-        if all_analyses:
-            print("\n--- GitHub Profile Analyses ---")
-            print(json.dumps(all_analyses, indent=2))
-
-        # Generate the meeting summary document
-        print("\n--- Generating Meeting Summary Document ---")
-        summary_file = create_meeting_summary(enriched_data, all_analyses)
-        if summary_file:
-            print(f"Meeting summary generated successfully: {summary_file}")
-
-        ## create doc of summary in google docs:
-        doc_url = create_google_docs_summary(summary_file)
-        if doc_url:
-            print(
-                f"Google Docs summary created successfully Click here to view: {doc_url}"
-            )
-        return {
-            "doc_url": doc_url if doc_url else None,
-            "summary": summary_file if summary_file else None,
-            "message": "Full meeting workflow completed successfully!",
-            "meetings": meetings,
-            "enriched_data": enriched_data,
-            "github_analyses": all_analyses,
-        }
+        return run_meeting_workflow(todaysDate, all_meetings)
     except (ValueError, FileNotFoundError) as e:
         print(f"\nAn error occurred: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"\nUnexpected error: {e}")
+        raise HTTPException(status_code=500, detail=f"Workflow failed: {e}")
+
+
+@app.post("/run-full-meeting-workflow")
+async def run_full_meeting_workflow(all_meetings: bool = False):
+    todaysDate = datetime.date.today().isoformat()
+    return await workflow_limiter.run(run_workflow_safely, todaysDate, all_meetings)
+
+
+def format_stage_event(stage: str, result, stream_format: str) -> str:
+    if stream_format == "ndjson":
+        event = {"stage": stage, "result": to_jsonable(result)}
+        return json.dumps(event, ensure_ascii=False, default=str) + "\n"
+    data = json.dumps(to_jsonable(result), ensure_ascii=False, default=str)
+    return f"event: {stage}\ndata: {data}\n\n"
+
+
+@app.get("/run-full-meeting-workflow/stream")
+async def stream_full_meeting_workflow(all_meetings: bool = False, format: str = "sse"):
+    """Stream each workflow stage as soon as it finishes, as SSE or NDJSON."""
+    if format not in ("sse", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be sse or ndjson")
+    todaysDate = datetime.date.today().isoformat()
+
+    stages = workflow_limiter.stream(
+        iter_workflow_stages(todaysDate, all_meetings)
+    )
+
+    async def events():
+        try:
+            async for stage, result in stages:
+                yield format_stage_event(stage, result, format)
+        except Exception as e:
+            print(f"\nWorkflow stream failed: {e}")
+            yield format_stage_event("error", {"error": str(e)}, format)
+            return
+        yield format_stage_event("done", {}, format)
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/event-stream"
+    return StreamingResponse(
+        events(), media_type=media_type, headers={"Cache-Control": "no-cache"}
+    )
+
+
+def run_workflow_job(queue: JobQueue, job: dict) -> dict:
+    """Run the workflow for a queued job, persisting each stage as it finishes."""
+    params = job["params"]
+    stages = iter_workflow_stages(params["date"], params["all_meetings"])
+    for stage, result in stages:
+        queue.record_stage(job["id"], stage, result)
+    return {"message": "Full meeting workflow completed successfully!"}
+
+
+# Quick SQLite calls: plain sync routes, run on Starlette's thread pool so
+# polling never waits behind the workflow pools
+@app.post("/jobs/full-meeting-workflow", status_code=202)
+def enqueue_full_meeting_workflow(all_meetings: bool = False):
+    params = {"date": datetime.date.today().isoformat(), "all_meetings": all_meetings}
+    job_id = job_queue.enqueue(WORKFLOW_JOB, params)
+    return {"job_id": job_id, "status": QUEUED}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
@@ -1,7 +1,7 @@
 from combinedTools.get_meeting_email import get_meetings_and_emails
 from combinedTools.enrich_tools import research_attendees
 from combinedTools.github_url_extractor import find_github_urls
-from combinedTools.githubProfileAnalsyer import analyze_github_profile
+from combinedTools.githubProfileAnalsyer import analyze_github_profiles
 from combinedTools.create_meet_summary import create_meeting_summary
 from combinedTools.google_docs_creation import create_google_docs_summary
 import datetime
@@ -15,7 +15,7 @@ if __name__ == "__main__":
         meetings = get_meetings_and_emails(todaysDate)
 
         print("\n--- Meeting Data and past conversations with Attendees: ---", meetings)
-        enriched_data = research_attendees(meetings)
+        enriched_data = research_attendees(meetings, batch=True)
 
         print("\n--- Full Enriched Attendee Data ---")
         if hasattr(enriched_data, "model_dump"):
@@ -26,20 +26,7 @@ if __name__ == "__main__":
         github_urls = find_github_urls(enriched_data)
         print(f"Extracted GitHub URLs: {github_urls}")
 
-        all_analyses = []
-
-        if github_urls:
-            for url in github_urls:
-                try:
-                    username = url.split("/")[-1]
-                    if username:
-                        print(f"\n--- Analyzing GitHub Profile: {username} ---")
-                        analysis = analyze_github_profile(username)
-                        all_analyses.append(analysis)
-                        print(f"Successfully analyzed GitHub profile: {username}")
-
-                except Exception as analysis_error:
-                    print(f"Failed to analyze profile at {url}: {analysis_error}")
+        all_analyses = analyze_github_profiles(github_urls)
 
         if all_analyses:
             print("\n--- GitHub Profile Analyses ---")
@@ -52,7 +39,7 @@ if __name__ == "__main__":
             print(f"Meeting summary generated successfully: {summary_file}")
 
         ## create doc of summary in google docs:
-        doc_url = create_google_docs_summary(summary_file)
+        doc_url = create_google_docs_summary(summary_file, meetings.get("event_id"))
         if doc_url:
             print(
                 f"Google Docs summary created successfully Click here to view: {doc_url}"